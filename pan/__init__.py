@@ -19,10 +19,17 @@
 
 __version__ = "1.2.2"
 
+import os
+import sys
+
+if os.getenv("PAN_PROFILE_IMPORTS"):
+    # Start profiling before importing anything else.
+    from pan import imports
+    imports.start_profiling()
+
 try:
     import pyotherside
 except ImportError:
-    import sys
     # Allow testing Python backend alone.
     print("PyOtherSide not found, continuing anyway!",
           file=sys.stderr)
@@ -37,9 +44,19 @@ from pan.paths import DATA_DIR
 from pan.paths import DATA_HOME_DIR
 from pan.paths import LOCALE_DIR
 from pan import i18n
+from pan import imports
+from pan import jsonlib
+from pan import metrics
 from pan import util
-from pan import http
+from pan import cache
+from pan import registry
 from pan.attrdict import AttrDict
+from pan.attrdict import LazyAttrDict
+from pan.cluster import ClusterTree
+from pan.grid import Grid
+from pan.identity import IdentityTable
+from pan.store import StationStore
+from pan.scheduler import Scheduler
 from pan.provider import Provider
 from pan.config import ConfigurationStore
 conf = ConfigurationStore()
@@ -47,15 +64,25 @@ from pan.application import Application
 
 assert Application
 assert AttrDict
+assert cache
 assert CACHE_HOME_DIR
+assert ClusterTree
 assert CONFIG_HOME_DIR
 assert ConfigurationStore
 assert DATA_DIR
 assert DATA_HOME_DIR
-assert http
+assert Grid
 assert i18n
+assert imports
+assert IdentityTable
+assert jsonlib
+assert LazyAttrDict
 assert LOCALE_DIR
+assert metrics
 assert Provider
+assert registry
+assert Scheduler
+assert StationStore
 assert util
 
 def main():
@@ -63,3 +90,10 @@ def main():
     conf.read()
     global app
     app = Application()
+    app.scheduler.start()
+    if imports.profiler is not None:
+        print("Slowest imports (self, cumulative):", file=sys.stderr)
+        for item in imports.profiler.get_times(20):
+            print("{:8.1f} ms {:8.1f} ms  {}".format(
+                item["self"] * 1000, item["cumulative"] * 1000, item["name"]),
+                  file=sys.stderr)
@@ -19,9 +19,15 @@
 
 __all__ = ("Application",)
 
-import copy
+import collections
+import concurrent.futures
+import itertools
+import os
 import pan
+import pyotherside
 import sys
+import threading
+import time
 
 
 class Application:
@@ -31,38 +37,176 @@ class Application:
     def __init__(self):
         """Initialize an :class:`Application` instance."""
         self.provider = None
+        self.scheduler = pan.Scheduler(self)
+        # Bounded pool of threads to query providers
+        # concurrently with, see list_networks.
+        self._executor = concurrent.futures.ThreadPoolExecutor(4)
+        # Recent lists of stations returned by list_stations,
+        # used to return differences only, by version token.
+        self._snapshots = collections.OrderedDict()
+        self._snapshots_lock = threading.Lock()
+        self._versions = itertools.count(1)
         self.set_provider(pan.conf.provider)
 
     def get_center(self):
         """Return coordinates of the current network's center point."""
         return self.provider.get_center(pan.conf.network)
 
+    def _get_changes(self, stations, version):
+        """Return changes in `stations` since snapshot `version`."""
+        new = collections.OrderedDict((x["id"], x) for x in stations)
+        with self._snapshots_lock:
+            old = self._snapshots.get(version)
+            if old is not None:
+                added = [v for k, v in new.items() if k not in old]
+                changed = [v for k, v in new.items() if k in old and old[k] != v]
+                removed = [k for k in old if k not in new]
+                if not (added or changed or removed):
+                    self._snapshots.move_to_end(version)
+                    return dict(version=version, reset=False,
+                                added=[], changed=[], removed=[])
+            version = str(next(self._versions))
+            self._snapshots[version] = new
+            while len(self._snapshots) > 8:
+                self._snapshots.popitem(last=False)
+        if old is None:
+            # Snapshot unknown or expired, client
+            # needs to start over with all stations.
+            return dict(version=version, reset=True,
+                        added=stations, changed=[], removed=[])
+        return dict(version=version, reset=False,
+                    added=added, changed=changed, removed=removed)
+
+    def get_stats(self):
+        """
+        Return a dictionary of performance statistics.
+
+        "metrics" are counters and latency histograms of API calls, HTTP
+        requests and the cache, see :meth:`pan.metrics.Registry.get_stats`,
+        and "pool" statistics of HTTP connection checkouts. If profiling
+        imports, "imports" are import times, see :mod:`pan.imports`.
+        """
+        import pan.http
+        stats = dict(metrics=pan.metrics.registry.get_stats(),
+                     pool=pan.http.pool.get_stats())
+        if pan.imports.profiler is not None:
+            stats["imports"] = pan.imports.profiler.get_times()
+        return stats
+
     def get_total_stations(self, bbox=None):
         """Return the total amount of bike stations for the current network."""
         return self.provider.get_total_stations(pan.conf.network, bbox)
 
-    def list_networks(self, x=0, y=0):
-        """Return a list of bike networks from all providers."""
+    def list_clusters(self, bbox=None, zoom=None):
+        """Return a list of clusters of bike stations for the current network."""
+        return self.provider.list_clusters(pan.conf.network, bbox, zoom)
+
+    def list_networks(self, x=0, y=0, limit=None, offset=0):
+        """
+        Return a list of bike networks from all providers.
+
+        Networks are sorted by distance from given coordinates. If `limit`
+        is not ``None``, return at most `limit` networks starting at `offset`.
+
+        Providers are queried concurrently and networks are merged as they
+        arrive. Providers that fail to respond within their timeout are
+        skipped and reported to QML via ``list-networks-partial``.
+        """
         networks = []
+        futures = {}
+        start = time.time()
         for provider in pan.util.get_providers():
             with pan.util.silent(Exception, tb=True):
                 provider = pan.Provider(provider["pid"])
-                networks.extend(provider.list_networks())
-        networks = copy.deepcopy(networks)
-        return pan.util.sorted_by_distance(networks, x, y)
+                # The nearest offset + limit networks overall are
+                # among the nearest offset + limit of each provider.
+                end = None if limit is None else offset + limit
+                future = self._executor.submit(
+                    provider.list_networks, x, y, end)
+                futures[future] = provider
+        deadlines = {k: start + v.timeout for k, v in futures.items()}
+        pending = set(futures)
+        while pending:
+            timeout = min(deadlines[x] for x in pending) - time.time()
+            done, pending = concurrent.futures.wait(
+                pending,
+                timeout=max(0, timeout),
+                return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                results = future.result()
+                # Errors are returned as dictionaries,
+                # skip those as one provider failing
+                # shouldn't prevent listing others.
+                if isinstance(results, list):
+                    networks.extend(results)
+            expired = [x for x in pending if deadlines[x] <= time.time()]
+            for future in expired:
+                pending.remove(future)
+                print("Provider '{}' timed out listing networks"
+                      .format(futures[future].id),
+                      file=sys.stderr)
+            if expired:
+                names = [futures[x].name for x in expired]
+                pyotherside.send("list-networks-partial", names)
+        return pan.util.sorted_by_distance(networks, x, y, limit, offset)
 
-    def list_stations(self, bbox=None):
-        """Return a list of bike stations for the current network."""
-        return self.provider.list_stations(pan.conf.network, bbox)
+    def list_stations(self, bbox=None, version=None):
+        """
+        Return a list of bike stations for the current network.
+
+        If `version` is not ``None``, return instead a dictionary of changes
+        since the list of stations returned with that version: "added" and
+        "changed" are lists of stations, "removed" a list of station ids and
+        "version" the token to pass for the next call. If "reset" is
+        ``True``, `version` was unknown, e.g. a blank string for the first
+        call, and all stations are listed as added.
+        """
+        stations = self.provider.list_stations(pan.conf.network, bbox)
+        if version is None or not isinstance(stations, list):
+            return stations
+        return self._get_changes(stations, version)
+
+    def query_viewport(self, bbox=None, fields=None, version=None, zoom=None):
+        """
+        Return a dictionary of `fields` of the current network within `bbox`.
+
+        See :meth:`pan.Provider.query_viewport` for `fields` and `zoom`. If
+        `version` is not ``None``, return "stations" as changes since the list
+        of stations returned with that version, see :meth:`list_stations`.
+        """
+        result = self.provider.query_viewport(
+            pan.conf.network, bbox, fields, zoom)
+        if version is not None and isinstance(result.get("stations"), list):
+            result["stations"] = self._get_changes(result["stations"], version)
+        return result
 
     def quit(self):
         """Quit the application."""
-        pan.http.pool.terminate()
+        # Terminating the connection pool aborts any request
+        # the scheduler might be waiting for.
+        self.scheduler.stop()
+        self._executor.shutdown(wait=False)
+        if "pan.http" in sys.modules:
+            pan.http.pool.terminate()
+        if "pan.asynchttp" in sys.modules:
+            pan.asynchttp.terminate()
+        if self.scheduler.is_alive():
+            self.scheduler.join(1)
         self.save()
+        if pan.conf.dump_metrics:
+            path = os.path.join(pan.CACHE_HOME_DIR, "metrics.json")
+            with pan.util.silent(Exception, tb=True):
+                pan.util.write_json(self.get_stats(), path)
 
     def save(self):
-        """Write configuration files."""
+        """Write configuration and cache files."""
         pan.conf.write()
+        if self.provider is not None:
+            self.provider.write_cache()
+
+    def set_active(self, active):
+        """Set whether stations are visible and should be kept updated."""
+        self.scheduler.active = active
 
     def set_provider(self, provider):
         """Set provider from string `provider`."""
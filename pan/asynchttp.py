@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+HTTP requests on an asyncio event loop.
+
+Requests are made on an event loop running in a dedicated thread, so that
+several requests can be in flight at once while callers stay synchronous,
+as PyOtherSide calls are. :func:`get` and :func:`get_json` work the same as
+those of :mod:`pan.http`, including conditional requests and metrics, and
+:func:`gather_json` makes several requests concurrently. Python 3.5 is
+required for ``async`` and ``await``.
+"""
+
+import asyncio
+import http.client
+import io
+import pan
+import pan.http
+import ssl
+import sys
+import threading
+import time
+import urllib.parse
+
+__all__ = ("ConnectionPool", "EventLoopThread")
+
+BROKEN_CONNECTION_ERRORS = (
+    asyncio.IncompleteReadError,
+    BrokenPipeError,
+    ConnectionResetError,
+    http.client.BadStatusLine,
+)
+
+
+class ConnectionPool:
+
+    """
+    A managed pool of persistent per-host connections on an event loop.
+
+    Connections are tuples of :class:`asyncio.StreamReader` and
+    :class:`asyncio.StreamWriter`. `threads` is the maximum amount of
+    connections per host. Connections that have been idle longer than
+    `idle_timeout` seconds are closed. All methods need to be called from
+    the thread running the event loop.
+    """
+
+    def __init__(self, threads, idle_timeout=60):
+        """Initialize a :class:`ConnectionPool` instance."""
+        self._alive = True
+        self._idle = {}
+        self._idle_timeout = idle_timeout
+        self._semaphores = {}
+        self._ssl_context = None
+        self._threads = threads
+
+    async def get(self, url):
+        """Return a connection to `url`, waiting if at limit."""
+        if not self._alive:
+            raise Exception("Pool terminated, get aborted")
+        key = self._get_key(url)
+        semaphore = self._semaphores.setdefault(key, asyncio.Semaphore(self._threads))
+        await semaphore.acquire()
+        try:
+            idle = self._idle.setdefault(key, [])
+            limit = time.time() - self._idle_timeout
+            while idle:
+                # Prefer the most recently used connection,
+                # which is the least likely to have timed out.
+                reader, writer, utime = idle.pop()
+                if (utime >= limit and
+                    not reader.at_eof() and
+                    not writer.transport.is_closing()):
+                    return reader, writer
+                writer.close()
+            return await self._new(url)
+        except BaseException:
+            semaphore.release()
+            raise
+
+    def _get_key(self, url):
+        """Return a dictionary key for the host of `url`."""
+        components = urllib.parse.urlparse(url)
+        return "{}:{}".format(components.scheme, components.netloc)
+
+    def is_alive(self):
+        """Return ``True`` if pool is in use."""
+        return self._alive
+
+    async def _new(self, url):
+        """Initialize and return a new connection to `url`."""
+        components = urllib.parse.urlparse(url)
+        print("Establishing connection to {}".format(components.netloc))
+        context = None
+        if components.scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            context = self._ssl_context
+        port = components.port or (443 if context else 80)
+        return await asyncio.wait_for(asyncio.open_connection(
+            components.hostname, port, ssl=context), _get_timeout(url))
+
+    def put(self, url, connection):
+        """Return `connection` to the pool of connections."""
+        self._semaphores[self._get_key(url)].release()
+        if connection is None: return
+        if not self._alive:
+            return connection[1].close()
+        idle = self._idle.setdefault(self._get_key(url), [])
+        idle.append(connection + (time.time(),))
+
+    def reset(self, url):
+        """Close idle connections to `url`."""
+        for reader, writer, utime in self._idle.pop(self._get_key(url), []):
+            writer.close()
+
+    def terminate(self):
+        """Close all idle connections and terminate."""
+        self._alive = False
+        for idle in self._idle.values():
+            for reader, writer, utime in idle:
+                writer.close()
+        self._idle.clear()
+
+
+class EventLoopThread(threading.Thread):
+
+    """A daemon thread running an asyncio event loop."""
+
+    def __init__(self):
+        """Initialize an :class:`EventLoopThread` instance."""
+        threading.Thread.__init__(self, daemon=True)
+        self.loop = asyncio.new_event_loop()
+
+    def run(self):
+        """Run the event loop until stopped."""
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    def run_coroutine(self, coroutine, timeout=None):
+        """Run `coroutine` on the event loop, block and return its result."""
+        if threading.current_thread() is self:
+            raise RuntimeError("Blocking call from the event loop thread")
+        future = asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+        return future.result(timeout)
+
+
+pool = ConnectionPool(4)
+
+# all_tasks and current_task are functions of the asyncio
+# module only since Python 3.7, earlier methods of Task.
+_all_tasks = getattr(asyncio, "all_tasks", None) or asyncio.Task.all_tasks
+_current_task = getattr(asyncio, "current_task", None) or asyncio.Task.current_task
+
+_terminated = False
+_thread = None
+_thread_lock = threading.Lock()
+
+
+def gather_json(urls, encoding="utf_8", retry=1, headers=None, compress=True, return_exceptions=False):
+    """
+    Make HTTP GET requests at `urls` concurrently, return responses parsed as JSON.
+
+    Return a list of parsed data in the same order as `urls`. Requests are
+    conditional, see :func:`pan.http.get_json`, and data is parsed in the
+    calling thread once all requests are done. If `return_exceptions` is
+    ``True``, return errors as exceptions in the list, otherwise raise the
+    first error.
+    """
+    requests = [(url,) + pan.http._add_validators("GET", url, headers)
+                for url in urls]
+    async def gather():
+        return await asyncio.gather(*[
+            _request_json_response(url, headers, retry, compress)
+            for url, headers, cached in requests],
+                                    return_exceptions=True)
+    responses = _run(gather())
+    results = []
+    for (url, headers, cached), response in zip(requests, responses):
+        try:
+            if isinstance(response, BaseException):
+                raise response
+            results.append(pan.http._parse_json(
+                "GET", url, response, cached, encoding))
+        except Exception as error:
+            if not return_exceptions: raise # Exception
+            results.append(error)
+    return results
+
+def get(url, encoding=None, retry=1, headers=None, compress=True):
+    """Make a HTTP GET request at `url` and return response."""
+    response = _run(_request_response("GET", url, None, retry, headers, compress))
+    return pan.http._get_body("GET", response, encoding)
+
+def get_json(url, encoding="utf_8", retry=1, headers=None, compress=True):
+    """Make a HTTP GET request at `url` and return response parsed as JSON."""
+    return gather_json([url], encoding, retry, headers, compress)[0]
+
+def _get_timeout(url):
+    """Return timeout in seconds for requests at `url`."""
+    # Use a longer timeout for localhost, see pan.http.
+    return (600 if pan.http.RE_LOCALHOST.search(url) else 15)
+
+async def _read_body(reader, method, status, headers, timeout):
+    """Return a list of chunks of body and ``True`` if connection can be reused."""
+    if method == "HEAD" or status in (204, 304) or 100 <= status <= 199:
+        return [], True
+    chunks = []
+    if "chunked" in headers.get("Transfer-Encoding", "").lower():
+        while True:
+            line = await asyncio.wait_for(reader.readline(), timeout)
+            size = int(line.split(b";")[0].strip(), 16)
+            if size == 0: break
+            chunks.append(await _read_exactly(reader, size, timeout))
+            await _read_exactly(reader, 2, timeout)
+        # Skip trailers up to the blank line ending the body.
+        while (await asyncio.wait_for(reader.readline(), timeout)).strip(): pass
+        return chunks, True
+    if headers.get("Content-Length") is not None:
+        length = int(headers["Content-Length"])
+        return [await _read_exactly(reader, length, timeout)], True
+    # Without a length, the body ends when the server closes the connection.
+    while True:
+        chunk = await asyncio.wait_for(reader.read(pan.http.CHUNK_SIZE), timeout)
+        if not chunk: break
+        chunks.append(chunk)
+    return chunks, False
+
+async def _read_exactly(reader, size, timeout):
+    """Return `size` bytes read from `reader`, timing out if idle."""
+    # Apply the timeout to each read rather than all of them,
+    # like http.client does, so that slow, but progressing
+    # downloads of large responses don't time out.
+    chunks = []
+    while size > 0:
+        chunk = await asyncio.wait_for(reader.read(min(size, pan.http.CHUNK_SIZE)), timeout)
+        if not chunk:
+            raise asyncio.IncompleteReadError(b"".join(chunks), size)
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+async def _request_json_response(url, headers=None, retry=1, compress=True):
+    """Make a HTTP GET request at `url`, return response expected to be JSON."""
+    response = await _request_response("GET", url, None, retry, headers, compress)
+    if pan.http._is_blank(response) and retry > 0:
+        # A blank return is probably an error.
+        pool.reset(url)
+        response = await _request_response("GET", url, None, retry, headers, compress)
+    return response
+
+async def _request_response(method, url, body=None, retry=1, headers=None, compress=True):
+    """
+    Make a HTTP request at `url` using `method`, return :class:`pan.http.Response`.
+
+    The returned response can have any status, it is up to the caller to
+    check that. See :func:`pan.http._request` for the arguments.
+    """
+    while True:
+        print("{} {}".format(method, url))
+        pan.metrics.registry.count("http.requests")
+        start = time.perf_counter()
+        connection = None
+        checked_out = False
+        try:
+            connection = await pool.get(url)
+            checked_out = True
+            response, reuse = await _send(
+                connection, method, url, body, headers, compress, start)
+            if not reuse:
+                connection[1].close()
+                connection = None
+            return response
+        except Exception as error:
+            if connection is not None:
+                connection[1].close()
+                connection = None
+            if not pool.is_alive(): raise
+            pan.metrics.registry.count("http.errors")
+            if not isinstance(error, BROKEN_CONNECTION_ERRORS) or retry <= 0:
+                name = error.__class__.__name__
+                print("{} failed: {}: {}"
+                      .format(method, name, str(error)),
+                      file=sys.stderr)
+                raise # Exception
+            # Try again with a new connection, the previous
+            # one was likely closed by the server while idle.
+            retry -= 1
+        finally:
+            if checked_out:
+                pool.put(url, connection)
+
+def _run(coroutine):
+    """Run `coroutine` on the event loop thread and return its result."""
+    global _thread
+    with _thread_lock:
+        if _terminated:
+            coroutine.close()
+            raise Exception("Event loop terminated")
+        if _thread is None:
+            _thread = EventLoopThread()
+            _thread.start()
+    return _thread.run_coroutine(coroutine)
+
+async def _send(connection, method, url, body, headers, compress, start):
+    """Send request, return :class:`pan.http.Response` and ``True`` if connection can be reused."""
+    reader, writer = connection
+    # Do relative requests (without scheme and netloc)
+    # for better compatibility with different servers.
+    components = urllib.parse.urlparse(url)
+    path = urllib.parse.urlunparse(("", "") + components[2:]) or "/"
+    headall = dict(Host=components.netloc)
+    headall.update(pan.http.HEADERS)
+    if compress:
+        headall["Accept-Encoding"] = "gzip, deflate"
+    headall.update(headers or {})
+    if isinstance(body, str):
+        # UTF-8 is likely to work in most cases,
+        # otherwise caller can encode and give bytes.
+        body = body.encode("utf_8")
+    if body is not None:
+        headall["Content-Length"] = str(len(body))
+    lines = ["{} {} HTTP/1.1".format(method, path)]
+    lines.extend("{}: {}".format(k, v) for k, v in headall.items())
+    writer.write("\r\n".join(lines + ["", ""]).encode("latin_1"))
+    if body:
+        writer.write(body)
+    timeout = _get_timeout(url)
+    await asyncio.wait_for(writer.drain(), timeout)
+    line = await asyncio.wait_for(reader.readline(), timeout)
+    if not line:
+        raise http.client.RemoteDisconnected(
+            "Remote end closed connection without response")
+    try:
+        version, status, *reason = line.decode("latin_1").split(None, 2)
+        status = int(status)
+    except ValueError:
+        raise http.client.BadStatusLine(repr(line))
+    reason = reason[0].strip() if reason else ""
+    lines = []
+    while True:
+        line = await asyncio.wait_for(reader.readline(), timeout)
+        if not line.strip(): break
+        lines.append(line)
+    headers = http.client.parse_headers(io.BytesIO(b"".join(lines) + b"\r\n"))
+    pan.metrics.registry.observe("http.latency", time.perf_counter() - start)
+    chunks, reuse = await _read_body(reader, method, status, headers, timeout)
+    pan.metrics.registry.count("http.bytes_received", sum(map(len, chunks)))
+    encoding = headers.get("Content-Encoding", "")
+    blob = b"".join(pan.http._decompress(chunks, encoding))
+    reuse = (reuse and
+             version == "HTTP/1.1" and
+             headers.get("Connection", "").lower() != "close")
+    return pan.http.Response(status=status,
+                             reason=reason,
+                             headers=headers,
+                             body=blob), reuse
+
+def terminate():
+    """Close all connections, abort requests in progress and stop."""
+    global _terminated
+    with _thread_lock:
+        _terminated = True
+        if _thread is None: return
+    async def stop():
+        pool.terminate()
+        tasks = [x for x in _all_tasks() if x is not _current_task()]
+        for task in tasks:
+            task.cancel()
+        # Let cancelled tasks finish to release their callers.
+        await asyncio.gather(*tasks, return_exceptions=True)
+    with pan.util.silent(Exception):
+        _thread.run_coroutine(stop(), timeout=1)
+    _thread.loop.call_soon_threadsafe(_thread.loop.stop)
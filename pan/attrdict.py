@@ -22,7 +22,9 @@
 
 """Dictionary with attribute access to keys."""
 
-__all__ = ("AttrDict",)
+import collections.abc
+
+__all__ = ("AttrDict", "LazyAttrDict", "LazyAttrList")
 
 
 class AttrDict(dict):
@@ -79,3 +81,148 @@ class AttrDict(dict):
         """Update dictionary with key-value pairs from arguments."""
         other = AttrDict(*args, **kwargs)
         return dict.update(self, other)
+
+
+class LazyAttrDict(collections.abc.MutableMapping):
+
+    """
+    Dictionary view with attribute access to keys.
+
+    Unlike :class:`AttrDict`, no copy is made: the given dictionary is used
+    as storage as-is and nested dictionaries are wrapped in new views only
+    when accessed, lists in :class:`LazyAttrList` views. Views are cheap,
+    but not cached, i.e. accessing the same nested dictionary twice returns
+    two distinct, but equal, views. Changes are made in the storage.
+    """
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data=None, **kwargs):
+        """Initialize a view of `data`, which defaults to a new dictionary."""
+        if isinstance(data, LazyAttrDict):
+            data = data._data
+        data = {} if data is None else data
+        data.update(kwargs)
+        object.__setattr__(self, "_data", data)
+
+    def __copy__(self):
+        """Return a shallow copy with storage copied as well."""
+        return LazyAttrDict(self._data.copy())
+
+    def __delattr__(self, name):
+        """Remove `name` from dictionary."""
+        try:
+            return self.__delitem__(name)
+        except KeyError as error:
+            raise AttributeError(str(error))
+
+    def __delitem__(self, key):
+        """Remove `key` from dictionary."""
+        del self._data[key]
+
+    def __eq__(self, other):
+        """Return ``True`` if equal to `other`."""
+        if isinstance(other, LazyAttrDict):
+            other = other._data
+        return self._data == other
+
+    def __getattr__(self, name):
+        """Return `name` from dictionary."""
+        if name == "_data" or name.startswith("__"):
+            # Avoid recursion if storage is not yet set,
+            # e.g. when copying or unpickling.
+            raise AttributeError(name)
+        try:
+            return self.__getitem__(name)
+        except KeyError as error:
+            raise AttributeError(str(error))
+
+    def __getitem__(self, key):
+        """Return `key` from dictionary."""
+        return _wrap(self._data[key])
+
+    def __iter__(self):
+        """Iterate over keys."""
+        return iter(self._data)
+
+    def __len__(self):
+        """Return the amount of keys."""
+        return len(self._data)
+
+    def __repr__(self):
+        """Return a string representation of dictionary."""
+        return "{}({!r})".format(self.__class__.__name__, self._data)
+
+    def __setattr__(self, name, value):
+        """Set `name` to `value` in dictionary."""
+        return self.__setitem__(name, value)
+
+    def __setitem__(self, key, value):
+        """Set `key` to `value` in dictionary."""
+        self._data[key] = _unwrap(value)
+
+
+class LazyAttrList(collections.abc.MutableSequence):
+
+    """List view with items wrapped as in :class:`LazyAttrDict`."""
+
+    __slots__ = ("_data",)
+
+    def __init__(self, data=None):
+        """Initialize a view of `data`, which defaults to a new list."""
+        self._data = [] if data is None else data
+
+    def __copy__(self):
+        """Return a shallow copy with storage copied as well."""
+        return LazyAttrList(self._data.copy())
+
+    def __delitem__(self, index):
+        """Remove item at `index`."""
+        del self._data[index]
+
+    def __eq__(self, other):
+        """Return ``True`` if equal to `other`."""
+        if isinstance(other, LazyAttrList):
+            other = other._data
+        return self._data == other
+
+    def __getitem__(self, index):
+        """Return item at `index`."""
+        if isinstance(index, slice):
+            return LazyAttrList(self._data[index])
+        return _wrap(self._data[index])
+
+    def __iter__(self):
+        """Iterate over items."""
+        return map(_wrap, self._data)
+
+    def __len__(self):
+        """Return the amount of items."""
+        return len(self._data)
+
+    def __repr__(self):
+        """Return a string representation of list."""
+        return "{}({!r})".format(self.__class__.__name__, self._data)
+
+    def __setitem__(self, index, value):
+        """Set item at `index` to `value`."""
+        self._data[index] = _unwrap(value)
+
+    def insert(self, index, value):
+        """Insert `value` before `index`."""
+        self._data.insert(index, _unwrap(value))
+
+
+def _unwrap(value):
+    """Return storage of `value` if a lazy view, else `value`."""
+    if isinstance(value, (LazyAttrDict, LazyAttrList)):
+        return value._data
+    return value
+
+def _wrap(value):
+    """Return `value` wrapped in a lazy view if a dictionary or a list."""
+    if isinstance(value, dict):
+        return LazyAttrDict(value)
+    if isinstance(value, list):
+        return LazyAttrList(value)
+    return value
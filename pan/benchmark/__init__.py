@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Performance benchmarks for the Python backend.
+
+Benchmarks are functions named ``bench_*`` in modules named ``bench_*.py``
+in this package. Each benchmark function yields pairs of a label and the
+time in seconds taken by a single call of the code being measured.
+Run all benchmarks with ``python3 -m pan.benchmark`` or ``make benchmark``.
+All data used is synthetic, generated with a fixed seed, so that results
+are comparable between runs and no network access is needed.
+"""
+
+import copy
+import json
+import math
+import pan
+import random
+import time
+
+# Sizes of synthetic networks, i.e. amounts of stations.
+SIZES = [1000, 10000, 100000]
+
+# Spacing of synthetic stations in degrees,
+# roughly 300 meters in the east-west direction.
+SPACING = 0.005
+
+
+class SyntheticProvider:
+
+    """Provider module stand-in serving synthetic stations."""
+
+    def __init__(self, n):
+        """Initialize a :class:`SyntheticProvider` instance."""
+        self.stations = synthetic_stations(n)
+
+    def list_networks(self):
+        """Return a list of supported city bike networks."""
+        return [dict(city="Helsinki",
+                     country="FI",
+                     id="synthetic",
+                     name="Synthetic",
+                     x=24.941,
+                     y=60.169)]
+
+    def list_stations(self, network):
+        """Return a list of bike stations and their occupancy."""
+        return copy.deepcopy(self.stations)
+
+
+def get_provider(n):
+    """Return a provider serving a synthetic network of `n` stations."""
+    provider = pan.Provider("citybikes")
+    provider._provider = SyntheticProvider(n)
+    provider._stations.clear()
+    provider.list_stations("synthetic")
+    return provider
+
+def get_viewport(width=0.04, height=0.02):
+    """Return a bounding box of given size at synthetic network's origin."""
+    return [24.941, 24.941 + width, 60.169, 60.169 + height]
+
+def pan_trajectory(steps=100, scale=1, seed=1):
+    """
+    Return a list of bounding boxes of a viewport panned around.
+
+    The trajectory is a random walk of small steps, mostly continuing in the
+    same direction, to mimic dragging the map. It is generated, not recorded
+    from actual use. `scale` multiplies the size of :func:`get_viewport`,
+    use a larger value to mimic a zoomed out map.
+    """
+    rd = random.Random(seed)
+    bbox = get_viewport(0.04 * scale, 0.02 * scale)
+    width = bbox[1] - bbox[0]
+    height = bbox[3] - bbox[2]
+    x, y = bbox[0], bbox[2]
+    dx = dy = 0
+    trajectory = []
+    for i in range(steps):
+        dx = 0.8 * dx + rd.uniform(-0.1, 0.1) * width
+        dy = 0.8 * dy + rd.uniform(-0.1, 0.1) * height
+        x, y = x + dx, y + dy
+        trajectory.append([x, x + width, y, y + height])
+    return trajectory
+
+def synthetic_networks(n, seed=1):
+    """Return a list of `n` networks randomly placed around the world."""
+    rd = random.Random(seed)
+    return [dict(city="City {:d}".format(i),
+                 country=rd.choice(["DE", "ES", "FI", "FR", "US"]),
+                 id="network-{:d}".format(i),
+                 name="Bikes {:d}".format(i),
+                 provider_id="synthetic",
+                 provider_name="Synthetic",
+                 x=rd.uniform(-180, 180),
+                 y=rd.uniform(-60, 70))
+            for i in range(n)]
+
+def synthetic_networks_payload(n, seed=1):
+    """
+    Return a citybik.es-shaped JSON catalogue of `n` networks as bytes.
+
+    The payload is generated to match the structure of the citybik.es API,
+    it is not a recording of actual responses.
+    """
+    rd = random.Random(seed)
+    return json.dumps(dict(networks=[dict(
+        id="network-{:d}".format(i),
+        location=dict(city="City {:d}".format(i),
+                      country=rd.choice(["DE", "ES", "FI", "FR", "US"]),
+                      latitude=rd.uniform(-60, 70),
+                      longitude=rd.uniform(-180, 180)),
+        name="Bikes Ñ{:d}".format(i),
+    ) for i in range(n)]), ensure_ascii=False).encode("utf_8")
+
+def synthetic_stations_payload(n, seed=1):
+    """
+    Return a citybik.es-shaped JSON network of `n` stations as bytes.
+
+    The payload is generated to match the structure of the citybik.es API,
+    including fields not used, it is not a recording of actual responses.
+    """
+    stations = synthetic_stations(n, seed)
+    return json.dumps(dict(network=dict(stations=[dict(
+        empty_slots=station["empty_slots"],
+        extra=dict(address="Street {:d}".format(i),
+                   slots=station["empty_slots"] + station["free_bikes"],
+                   uid=str(i)),
+        free_bikes=station["free_bikes"],
+        id="{:032x}".format(i),
+        latitude=station["y"],
+        longitude=station["x"],
+        name="{:06d} - {}, Töölö".format(i, station["name"]),
+        timestamp="2018-06-01T12:00:00.000000Z",
+    ) for i, station in enumerate(stations)])), ensure_ascii=False).encode("utf_8")
+
+def synthetic_stations(n, seed=1):
+    """
+    Return a list of `n` randomly placed stations.
+
+    Stations are placed at constant density, expanding from the origin of
+    :func:`get_viewport` as `n` grows, to mimic larger networks rather
+    than denser ones.
+    """
+    rd = random.Random(seed)
+    side = math.sqrt(n) * SPACING
+    return [dict(empty_slots=rd.randint(0, 20),
+                 free_bikes=rd.randint(0, 20),
+                 id="synthetic-{:d}".format(i),
+                 name="Station {:d}".format(i),
+                 x=24.941 + rd.uniform(-side/2, side/2),
+                 y=60.169 + rd.uniform(-side/4, side/4))
+            for i in range(n)]
+
+def timeit(function, *args, **kwargs):
+    """Return the best time in seconds of calling `function`."""
+    best = float("inf")
+    total = 0
+    while total < 0.2:
+        start = time.perf_counter()
+        function(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = min(best, elapsed)
+        total += elapsed
+    return best
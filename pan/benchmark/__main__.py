@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Run benchmarks and print results.
+
+Usage: python3 -m pan.benchmark [--output FILE] [--compare FILE] [PATTERN...]
+
+PATTERN is a shell-style pattern matched against the full name of the
+benchmark, e.g. "bench_provider.*". Results can be written to a JSON file
+with --output and compared to such a file from an earlier run, e.g. of
+another commit, with --compare.
+"""
+
+import argparse
+import fnmatch
+import glob
+import importlib
+import json
+import os
+import pan
+import platform
+import time
+
+numpy = pan.imports.lazy_import("numpy")
+
+def compare(results, path):
+    """Print `results` side by side with those in file at `path`."""
+    with open(path, "r", encoding="utf_8") as f:
+        previous = json.load(f)["results"]
+    previous = {(x["name"], x["label"]): x["seconds"] for x in previous}
+    for result in results:
+        key = (result["name"], result["label"])
+        if key not in previous: continue
+        change = result["seconds"] / previous[key] - 1
+        print("{:<60s} {:>12.1f} µs {:>12.1f} µs {:>+7.1%}".format(
+            "{} {}".format(*key), previous[key] * 10**6,
+            result["seconds"] * 10**6, change))
+
+def main(patterns, output=None, previous=None):
+    """Run benchmarks matching `patterns` and return results."""
+    directory = os.path.dirname(os.path.abspath(__file__))
+    results = []
+    for path in sorted(glob.glob(os.path.join(directory, "bench_*.py"))):
+        name = os.path.basename(path)[:-3]
+        module = importlib.import_module("pan.benchmark.{}".format(name))
+        for attr in sorted(dir(module)):
+            if not attr.startswith("bench_"): continue
+            full_name = "{}.{}".format(name, attr)
+            if patterns and not any(fnmatch.fnmatch(full_name, x) for x in patterns): continue
+            for label, seconds in getattr(module, attr)():
+                print("{:<60s} {:>12.1f} µs".format(
+                    "{} {}".format(full_name, label), seconds * 10**6))
+                results.append(dict(name=full_name, label=label, seconds=seconds))
+    if output is not None:
+        pan.util.write_json(dict(
+            json_backend=pan.jsonlib.backend,
+            numpy=numpy is not None and numpy.version.version,
+            python=platform.python_version(),
+            results=results,
+            time=time.strftime("%Y-%m-%dT%H:%M:%S"),
+            version=pan.__version__,
+        ), output)
+    if previous is not None:
+        print("")
+        compare(results, previous)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python3 -m pan.benchmark")
+    parser.add_argument("--compare", metavar="FILE",
+                        help="compare to results in FILE")
+    parser.add_argument("--output", metavar="FILE",
+                        help="write results as JSON to FILE")
+    parser.add_argument("patterns", metavar="PATTERN", nargs="*",
+                        help="pattern of names of benchmarks to run")
+    args = parser.parse_args()
+    main(args.patterns, args.output, args.compare)
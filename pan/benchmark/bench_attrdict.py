@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks for :class:`pan.AttrDict` and :class:`pan.LazyAttrDict`."""
+
+import json
+import pan
+
+from pan.benchmark import SIZES
+from pan.benchmark import synthetic_stations_payload
+from pan.benchmark import timeit
+
+def bench_attrdict():
+    """Wrap a parsed network of stations and access all stations."""
+    yield from _wrap(pan.AttrDict)
+
+def bench_lazy_attrdict():
+    """Wrap a parsed network of stations and access all stations."""
+    yield from _wrap(pan.LazyAttrDict)
+
+def _wrap(cls):
+    """Yield timing of wrapping parsed payloads in `cls`."""
+    def access(data):
+        # Mimic the access pattern of providers.
+        for station in cls(data).network.stations:
+            station.id, station.latitude, station.longitude
+    for n in SIZES[:-1]:
+        data = json.loads(synthetic_stations_payload(n))
+        yield "n={:d}".format(n), timeit(access, data)
@@ -0,0 +1,41 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks for :class:`pan.ConfigurationStore`."""
+
+import pan
+
+from pan.benchmark import timeit
+
+def bench_attribute():
+    """Get the value of an option via attribute access."""
+    conf = pan.ConfigurationStore()
+    yield "max_stations", timeit(lambda: conf.max_stations)
+
+def bench_get():
+    """Get the value of an option via :meth:`get`."""
+    conf = pan.ConfigurationStore()
+    yield "max_stations", timeit(conf.get, "max_stations")
+
+def bench_init():
+    """Initialize a configuration store with default values."""
+    yield "defaults", timeit(pan.ConfigurationStore)
+
+def bench_set():
+    """Set the value of an option via :meth:`set`."""
+    conf = pan.ConfigurationStore()
+    yield "max_stations", timeit(conf.set, "max_stations", 100)
@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks for :mod:`pan.jsonlib`."""
+
+import json
+import pan
+
+from pan.benchmark import synthetic_networks_payload
+from pan.benchmark import synthetic_stations_payload
+from pan.benchmark import timeit
+
+def bench_loads_networks():
+    """Parse a catalogue of networks using each available backend."""
+    yield from _compare(synthetic_networks_payload(700), "n=700")
+
+def bench_loads_stations():
+    """Parse a network of stations using each available backend."""
+    for n in [1000, 10000]:
+        yield from _compare(synthetic_stations_payload(n), "n={:d}".format(n))
+
+def _compare(blob, label):
+    """Yield timing of parsing `blob` with each backend."""
+    # Compare to how data was parsed before, via an intermediate text copy.
+    seconds = timeit(lambda: json.loads(blob.decode("utf_8", errors="replace")))
+    yield "{}, json text".format(label), seconds
+    backend = pan.jsonlib.backend
+    try:
+        for name in pan.jsonlib.get_backends():
+            pan.jsonlib.set_backend(name)
+            seconds = timeit(pan.jsonlib.loads, blob)
+            yield "{}, {}".format(label, name), seconds
+    finally:
+        pan.jsonlib.set_backend(backend)
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks for :class:`pan.Provider`."""
+
+from pan.benchmark import get_provider
+from pan.benchmark import get_viewport
+from pan.benchmark import pan_trajectory
+from pan.benchmark import SIZES
+from pan.benchmark import timeit
+
+def bench_get_center():
+    """Calculate the center of the network as the network grows."""
+    for n in SIZES:
+        provider = get_provider(n)
+        seconds = timeit(provider.get_center, "synthetic")
+        yield "n={:d}".format(n), seconds
+
+def bench_get_total_stations():
+    """Count stations in a fixed-size viewport as the network grows."""
+    bbox = get_viewport()
+    for n in SIZES:
+        provider = get_provider(n)
+        seconds = timeit(provider.get_total_stations, "synthetic", bbox)
+        yield "n={:d}".format(n), seconds
+
+def bench_list_stations():
+    """Query a fixed-size viewport as the network grows."""
+    bbox = get_viewport()
+    for n in SIZES:
+        provider = get_provider(n)
+        seconds = timeit(provider.list_stations, "synthetic", bbox)
+        yield "n={:d}".format(n), seconds
+
+def bench_list_stations_pan():
+    """Query a viewport being panned around, per step of the trajectory."""
+    def replay(provider, trajectory, incremental):
+        for bbox in trajectory:
+            if not incremental:
+                provider._viewports.clear()
+            provider.list_stations("synthetic", bbox)
+    for n in SIZES:
+        provider = get_provider(n)
+        for scale in (1, 4, 16):
+            trajectory = pan_trajectory(scale=scale)
+            for incremental in (False, True):
+                seconds = timeit(replay, provider, trajectory, incremental)
+                label = "incremental" if incremental else "full"
+                yield ("n={:d}, scale={:d}, {}".format(n, scale, label),
+                       seconds / len(trajectory))
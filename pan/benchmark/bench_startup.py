@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks for starting the application."""
+
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Maximum time in seconds to import pan and run pan.main,
+# the benchmark fails if the median of runs is slower.
+BUDGET = 0.5
+
+SCRIPT = """
+import time
+start = time.perf_counter()
+import pan
+pan.main()
+print(time.perf_counter() - start)
+pan.app.quit()
+"""
+
+def bench_main():
+    """Import :mod:`pan` and run :func:`pan.main` in a new process."""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    directory = tempfile.mkdtemp()
+    # Start with empty configuration and cache,
+    # not touching those of the actual user.
+    env = dict(os.environ,
+               PYTHONPATH=root,
+               XDG_CACHE_HOME=os.path.join(directory, "cache"),
+               XDG_CONFIG_HOME=os.path.join(directory, "config"),
+               XDG_DATA_HOME=os.path.join(directory, "data"))
+    env.pop("PAN_PROFILE_IMPORTS", None)
+    def run():
+        output = subprocess.check_output([sys.executable, "-c", SCRIPT],
+                                         env=env, stderr=subprocess.DEVNULL)
+        return float(output.split()[-1])
+    try:
+        seconds = statistics.median(run() for i in range(5))
+    finally:
+        shutil.rmtree(directory)
+    if seconds > BUDGET:
+        raise AssertionError("Startup took {:.3f} s, over budget of {:.3f} s"
+                             .format(seconds, BUDGET))
+    yield "import pan; pan.main()", seconds
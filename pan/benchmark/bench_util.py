@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Benchmarks for :mod:`pan.util`."""
+
+import pan
+
+from pan.benchmark import SIZES
+from pan.benchmark import synthetic_networks
+from pan.benchmark import timeit
+
+def bench_sorted_by_distance():
+    """Sort networks by distance, all and only the nearest 20."""
+    for n in SIZES:
+        networks = synthetic_networks(n)
+        for limit in (None, 20):
+            seconds = timeit(pan.util.sorted_by_distance,
+                             networks, 24.941, 60.169, limit)
+            yield "n={:d}, limit={}".format(n, limit), seconds
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Persistent cache of downloaded data.
+
+Data is written as JSON files under :attr:`pan.CACHE_HOME_DIR` along with
+the time of download, so that data can be shown immediately at startup
+and marked stale for an update to be downloaded in the background.
+"""
+
+import os
+import pan
+import time
+import urllib.parse
+
+def get_path(*names):
+    """Return path to the cache file identified by `names`."""
+    names = [urllib.parse.quote(x, safe="") for x in names]
+    names[-1] = "{}.json".format(names[-1])
+    return os.path.join(pan.CACHE_HOME_DIR, *names)
+
+def read(*names):
+    """
+    Read data from the cache file identified by `names`.
+
+    Return a tuple of data and the time of its download, which are ``None``
+    and -1 if the cache file is missing or can't be read.
+    """
+    path = get_path(*names)
+    if not os.path.isfile(path):
+        pan.metrics.registry.count("cache.misses")
+        return None, -1
+    with pan.util.silent(Exception, tb=True):
+        cache = pan.util.read_json(path)
+        if cache.get("version") == pan.__version__:
+            pan.metrics.registry.count("cache.hits")
+            return cache["data"], cache["utime"]
+    pan.metrics.registry.count("cache.misses")
+    return None, -1
+
+def write(data, *names, utime=None):
+    """Write `data` to the cache file identified by `names`."""
+    path = get_path(*names)
+    utime = time.time() if utime is None else utime
+    cache = dict(data=data, utime=utime, version=pan.__version__)
+    with pan.util.silent(Exception, tb=True):
+        pan.util.write_json(cache, path)
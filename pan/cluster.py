@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Hierarchical grid clustering of stations."""
+
+import copy
+import math
+import pan
+
+numpy = pan.imports.lazy_import("numpy")
+
+__all__ = ("ClusterTree",)
+
+# Cells per map tile in each direction, i.e. with 256 pixel
+# tiles, clusters cover 64 x 64 pixel cells on the screen.
+CELLS_PER_TILE = 4
+
+# Maximum amount of cells across a bounding box in either direction,
+# which bounds the amount of clusters returned for any bounding box.
+MAX_CELLS_ACROSS = 16
+
+MAX_ZOOM = 18
+MIN_ZOOM = 0
+
+# Amounts of cells in each direction at each zoom level.
+# Cells of a zoom level are split into 2 x 2 at the next.
+SIZES = {z: CELLS_PER_TILE * 2**z for z in range(MIN_ZOOM, MAX_ZOOM + 1)}
+
+# Fields aggregated per cluster. Counts can be missing,
+# so sums are accompanied by the amount of known values.
+FIELDS = ("count", "x", "y", "free_bikes", "free_bikes_known",
+          "empty_slots", "empty_slots_known")
+
+
+class ClusterTree:
+
+    """
+    Hierarchical grid clustering of stations.
+
+    Stations are aggregated into cells of a grid in Web Mercator
+    coordinates at the most detailed zoom level and cells are then
+    aggregated level by level into cells of the parent level. All levels
+    are computed once at initialization, a query is then a filter of the
+    cells of one level. The layout of stations in cells is kept, so that
+    counts of stations at the same positions can be aggregated again
+    without projecting and grouping, see :meth:`replace`.
+    """
+
+    def __init__(self, stations):
+        """Initialize a :class:`ClusterTree` instance."""
+        self._layout = None
+        self._levels = {}
+        self._xy = None
+        if not stations: return
+        if numpy is not None:
+            self._init_layout_numpy(stations)
+        else:
+            self._init_layout(stations)
+        self._aggregate(stations)
+
+    def _aggregate(self, stations):
+        """Initialize levels of clusters from counts of `stations`."""
+        if isinstance(self._layout, dict):
+            return self._aggregate_numpy(stations)
+        cells = {}
+        for key, station in zip(self._layout, stations):
+            free = station.get("free_bikes")
+            empty = station.get("empty_slots")
+            values = (1, station["x"], station["y"],
+                      free or 0, int(free is not None),
+                      empty or 0, int(empty is not None))
+            cell = cells.setdefault(key, [0] * len(FIELDS))
+            for i, value in enumerate(values):
+                cell[i] += value
+        self._levels[MAX_ZOOM] = cells
+        for zoom in range(MAX_ZOOM - 1, MIN_ZOOM - 1, -1):
+            parents = {}
+            for (ix, iy), values in cells.items():
+                parent = parents.setdefault((ix >> 1, iy >> 1), [0] * len(FIELDS))
+                for i, value in enumerate(values):
+                    parent[i] += value
+            self._levels[zoom] = cells = parents
+
+    def _aggregate_numpy(self, stations):
+        """Initialize levels of clusters from counts of `stations` using NumPy."""
+        free = _column(stations, "free_bikes")
+        empty = _column(stations, "empty_slots")
+        values = numpy.column_stack((
+            numpy.ones(len(free)), self._xy[0], self._xy[1],
+            numpy.nan_to_num(free), ~numpy.isnan(free),
+            numpy.nan_to_num(empty), ~numpy.isnan(empty)))
+        for zoom in range(MAX_ZOOM, MIN_ZOOM - 1, -1):
+            # Aggregate stations at the most detailed level,
+            # then clusters of the previous level at others.
+            ix, iy, inverse = self._layout[zoom]
+            values = numpy.column_stack([
+                numpy.bincount(inverse, values[:,i], len(ix))
+                for i in range(len(FIELDS))])
+            self._levels[zoom] = (ix, iy, values)
+
+    def _get_cluster(self, zoom, ix, iy, values):
+        """Return cluster as a dictionary."""
+        count, x, y, free, nfree, empty, nempty = values
+        return dict(count=int(count),
+                    empty_slots=int(empty) if nempty else None,
+                    free_bikes=int(free) if nfree else None,
+                    id="{:d}/{:d}/{:d}".format(zoom, int(ix), int(iy)),
+                    x=float(x / count),
+                    y=float(y / count))
+
+    def _get_zoom(self, bbox, zoom):
+        """Return zoom level to use for `bbox` at `zoom`."""
+        xmin, xmax, ymin, ymax = bbox
+        width = max(project_x(xmax) - project_x(xmin), 0)
+        height = max(project_y(ymin) - project_y(ymax), 0)
+        zoom = MAX_ZOOM if zoom is None else zoom
+        zoom = max(MIN_ZOOM, min(MAX_ZOOM, int(zoom)))
+        size = max(width, height)
+        while zoom > MIN_ZOOM and size * SIZES[zoom] > MAX_CELLS_ACROSS:
+            zoom -= 1
+        return zoom
+
+    def _init_layout(self, stations):
+        """Initialize cells of stations at the most detailed level."""
+        size = SIZES[MAX_ZOOM]
+        self._layout = [(min(size - 1, int(project_x(x["x"]) * size)),
+                         min(size - 1, int(project_y(x["y"]) * size)))
+                        for x in stations]
+
+    def _init_layout_numpy(self, stations):
+        """Initialize cells of stations and clusters at all levels using NumPy."""
+        x, y = _column(stations, "x"), _column(stations, "y")
+        size = SIZES[MAX_ZOOM]
+        ix = numpy.minimum(size - 1, (project_x(x) * size).astype(numpy.int64))
+        iy = numpy.minimum(size - 1, (project_y(y) * size).astype(numpy.int64))
+        self._layout = {}
+        self._xy = (x, y)
+        for zoom in range(MAX_ZOOM, MIN_ZOOM - 1, -1):
+            # Cells of stations at the most detailed level,
+            # then cells of clusters of the previous level at others.
+            keys, inverse = numpy.unique(
+                (ix << 32) | iy, return_inverse=True)
+            ix, iy = keys >> 32, keys & 0xffffffff
+            self._layout[zoom] = (ix, iy, inverse.ravel())
+            ix, iy = ix >> 1, iy >> 1
+
+    def list(self, bbox, zoom=None):
+        """
+        Return a list of clusters inside `bbox` at `zoom`.
+
+        Clusters are dictionaries with keys "id", "count", "free_bikes",
+        "empty_slots", "x" and "y". Counts are sums of those of the stations
+        in the cluster and ``None`` if missing for all, coordinates are the
+        mean of those of the stations. `zoom` is lowered if needed to keep
+        the amount of clusters bounded, if ``None``, the most detailed zoom
+        level that does so is used.
+        """
+        if not self._levels: return []
+        xmin, xmax, ymin, ymax = bbox
+        zoom = self._get_zoom(bbox, zoom)
+        size = SIZES[zoom]
+        ixmin = math.floor(project_x(xmin) * size)
+        ixmax = math.floor(project_x(xmax) * size)
+        iymin = math.floor(project_y(ymax) * size)
+        iymax = math.floor(project_y(ymin) * size)
+        if isinstance(self._levels[zoom], tuple):
+            ix, iy, values = self._levels[zoom]
+            indices = numpy.flatnonzero((ix >= ixmin) & (ix <= ixmax) &
+                                        (iy >= iymin) & (iy <= iymax))
+            return [self._get_cluster(zoom, ix[i], iy[i], values[i])
+                    for i in indices]
+        return [self._get_cluster(zoom, ix, iy, values)
+                for (ix, iy), values in self._levels[zoom].items()
+                if ixmin <= ix <= ixmax and iymin <= iy <= iymax]
+
+
+    def replace(self, stations):
+        """
+        Return a new :class:`ClusterTree` of `stations`.
+
+        `stations` should be at the same positions and in the same order as
+        those this tree was initialized with, only counts are aggregated.
+        """
+        tree = copy.copy(self)
+        tree._levels = {}
+        if stations:
+            tree._aggregate(stations)
+        return tree
+
+def _column(stations, name):
+    """Return an array of `name` of `stations`, missing values NaN."""
+    values = [x.get(name) for x in stations]
+    values = [numpy.nan if x is None else x for x in values]
+    return numpy.array(values, dtype=float)
+
+def project_x(x):
+    """Return Web Mercator x in [0, 1] of longitude `x`."""
+    return (x + 180) / 360
+
+def project_y(y):
+    """Return Web Mercator y in [0, 1], north to south, of latitude `y`."""
+    # Clamp to the limits of Web Mercator to avoid infinities.
+    if numpy is not None and isinstance(y, numpy.ndarray):
+        y = numpy.radians(numpy.clip(y, -85.0511, 85.0511))
+        return numpy.clip((1 - numpy.arcsinh(numpy.tan(y)) / math.pi) / 2, 0, 1)
+    y = math.radians(max(-85.0511, min(85.0511, y)))
+    return max(0, min(1, (1 - math.asinh(math.tan(y)) / math.pi) / 2))
@@ -25,10 +25,14 @@ import sys
 __all__ = ("ConfigurationStore",)
 
 DEFAULTS = {
+    "dump_metrics": False,
     "max_stations": 50,
     "network": "hsl",
     "network_label": "Helsinki",
     "provider": "hsl",
+    "provider_timeout": 10,
+    "stale_while_revalidate": True,
+    "ttl": 60,
 }
 
 
@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Uniform grid spatial index of points."""
+
+import bisect
+import copy
+import math
+
+__all__ = ("Grid",)
+
+
+class Grid:
+
+    """
+    Uniform grid spatial index of points.
+
+    Items are dictionaries with keys "x" and "y". Items are stored packed,
+    sorted by grid cell in row-major order, so that a row of cells covered by
+    a query is a single contiguous slice of :attr:`items`.
+    """
+
+    def __init__(self, items, size=4):
+        """Initialize a :class:`Grid` instance from `items`."""
+        # Aim for an average of `size` items per cell.
+        items = list(items)
+        self.items = []
+        self._offsets = [0, 0]
+        self._ncol = 1
+        self._nrow = 1
+        self._x0 = self._y0 = 0
+        self._dx = self._dy = 1
+        self._bbox = (0, 0, 0, 0)
+        if not items: return
+        xs = sorted(x["x"] for x in items)
+        ys = sorted(x["y"] for x in items)
+        self._bbox = (xs[0], xs[-1], ys[0], ys[-1])
+        # Size cells by the extent of the bulk of items, outliers,
+        # e.g. stations with bogus coordinates, are placed in the
+        # cells at the edges as positions are clamped.
+        xmin, xmax = self._get_extent(xs)
+        ymin, ymax = self._get_extent(ys)
+        width = max(xmax - xmin, 1e-9)
+        height = max(ymax - ymin, 1e-9)
+        side = math.sqrt(width * height * size / len(items))
+        self._ncol = max(1, min(len(items), math.ceil(width / side)))
+        self._nrow = max(1, min(len(items), math.ceil(height / side)))
+        self._x0 = xmin
+        self._y0 = ymin
+        self._dx = width / self._ncol
+        self._dy = height / self._nrow
+        cells = [self._get_cell(x) for x in items]
+        order = sorted(range(len(items)), key=cells.__getitem__)
+        self.items = [items[i] for i in order]
+        self._offsets = [0] * (self._ncol * self._nrow + 1)
+        for cell in cells:
+            self._offsets[cell+1] += 1
+        for i in range(1, len(self._offsets)):
+            self._offsets[i] += self._offsets[i-1]
+
+    def __iter__(self):
+        """Iterate over all items."""
+        return iter(self.items)
+
+    def __len__(self):
+        """Return the amount of items."""
+        return len(self.items)
+
+    def _get_cell(self, item):
+        """Return index of the cell that contains `item`."""
+        col = self._get_col(item["x"])
+        row = self._get_row(item["y"])
+        return row * self._ncol + col
+
+    def _get_col(self, x):
+        """Return index of the column that contains `x`, clamped."""
+        col = math.floor((x - self._x0) / self._dx)
+        return max(0, min(self._ncol - 1, col))
+
+    def _get_extent(self, values):
+        """Return minimum and maximum of sorted `values` without outliers."""
+        # Use Tukey's fences for "far out" values, which for any
+        # reasonable distribution of stations excludes nothing.
+        q1 = values[len(values) // 4]
+        q3 = values[len(values) * 3 // 4]
+        iqr = q3 - q1
+        lo = bisect.bisect_left(values, q1 - 3 * iqr)
+        hi = bisect.bisect_right(values, q3 + 3 * iqr)
+        return values[lo], values[hi-1]
+
+    def _get_row(self, y):
+        """Return index of the row that contains `y`, clamped."""
+        row = math.floor((y - self._y0) / self._dy)
+        return max(0, min(self._nrow - 1, row))
+
+    def query(self, xmin, xmax, ymin, ymax):
+        """Return a list of items strictly inside given bounding box."""
+        return [x for x in self.query_candidates(xmin, xmax, ymin, ymax)
+                if xmin < x["x"] < xmax and ymin < x["y"] < ymax]
+
+    def query_candidates(self, xmin, xmax, ymin, ymax):
+        """Return a list of items in cells overlapping given bounding box."""
+        candidates = []
+        for start, end in self.query_slices(xmin, xmax, ymin, ymax):
+            candidates.extend(self.items[start:end])
+        return candidates
+
+    def query_slices(self, xmin, xmax, ymin, ymax):
+        """Return index ranges of items in cells overlapping bounding box."""
+        if not self.items: return []
+        x0, x1, y0, y1 = self._bbox
+        if xmax < x0 or xmin > x1: return []
+        if ymax < y0 or ymin > y1: return []
+        cmin, cmax = self._get_col(xmin), self._get_col(xmax)
+        rmin, rmax = self._get_row(ymin), self._get_row(ymax)
+        slices = []
+        for row in range(rmin, rmax + 1):
+            start = self._offsets[row * self._ncol + cmin]
+            end = self._offsets[row * self._ncol + cmax + 1]
+            if end > start:
+                slices.append((start, end))
+        return slices
+
+    def replace(self, items):
+        """
+        Return a new :class:`Grid` of `items` sharing the index of this one.
+
+        `items` should be at the same positions as and in the same order as
+        :attr:`items`, e.g. updated versions of the same stations.
+        """
+        grid = copy.copy(self)
+        grid.items = list(items)
+        return grid
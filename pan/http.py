@@ -17,14 +17,19 @@
 
 """Managed persistent HTTP connections."""
 
+import collections
 import http.client
-import json
 import pan
-import queue
 import re
 import sys
 import threading
+import time
 import urllib.parse
+import zlib
+
+# Size of chunks in bytes to read
+# from compressed response bodies.
+CHUNK_SIZE = 65536
 
 BROKEN_CONNECTION_ERRORS = [
     BrokenPipeError,
@@ -39,41 +44,73 @@ HEADERS = {
 
 RE_LOCALHOST = re.compile(r"://(127.0.0.1|localhost)\b")
 
+CachedResponse = collections.namedtuple("CachedResponse", "validators data")
+Response = collections.namedtuple("Response", "status reason headers body")
+
 
 class ConnectionPool:
 
-    """A managed pool of persistent per-host HTTP connections."""
+    """
+    A managed pool of persistent per-host HTTP connections.
+
+    `threads` is the default maximum amount of connections per host, which
+    can be changed for specific hosts using :meth:`set_limit`. Connections
+    that have been idle longer than `idle_timeout` seconds are closed.
+    """
 
-    def __init__(self, threads):
+    def __init__(self, threads, idle_timeout=60):
         """Initialize a :class:`ConnectionPool` instance."""
         self._alive = True
         self._all_connections = set()
+        self._busy = {}
+        self._idle = {}
+        self._idle_timeout = idle_timeout
+        self._limits = {}
         self._lock = threading.Lock()
-        self._queue = {}
+        self._stats = dict(checkouts=0, waits=0, wait_time=0, wait_time_max=0)
         self._threads = threads
+        self._wakeups = {}
 
-    @pan.util.locked_method
-    def _allocate(self, url):
-        """Initialize a queue of HTTP connections to `url`."""
-        key = self._get_key(url)
-        if key in self._queue: return
-        self._queue[key] = queue.LifoQueue()
-        for i in range(self._threads):
-            self._queue[key].put(None)
+    def _evict(self, key):
+        """Close connections to `key` idle longer than timeout."""
+        idle = self._idle.setdefault(key, [])
+        limit = time.time() - self._idle_timeout
+        while idle and idle[0][1] < limit:
+            connection = idle.pop(0)[0]
+            self._all_connections.discard(connection)
+            with pan.util.silent(Exception):
+                connection.close()
 
     def get(self, url):
         """Return an HTTP connection to `url`."""
         key = self._get_key(url)
-        if key not in self._queue:
-            self._allocate(url)
-        while True:
-            # Make sure no Queue.get call is left blocking
-            # once the connection pool has been terminated.
-            if not self._alive:
-                raise Exception("Pool terminated, get aborted")
-            with pan.util.silent(queue.Empty):
-                connection = self._queue[key].get(timeout=1)
-                break
+        start = time.time()
+        waited = False
+        with self._lock:
+            wakeup = self._get_wakeup(key)
+            while True:
+                # Make sure no call is left blocking
+                # once the connection pool has been terminated.
+                if not self._alive:
+                    raise Exception("Pool terminated, get aborted")
+                self._evict(key)
+                if self._idle[key]:
+                    # Prefer the most recently used connection,
+                    # which is the least likely to have timed out.
+                    connection = self._idle[key].pop()[0]
+                    break
+                if self._busy.get(key, 0) < self._limits.get(key, self._threads):
+                    connection = None
+                    break
+                wakeup.wait()
+                waited = True
+            self._busy[key] = self._busy.get(key, 0) + 1
+            wait_time = time.time() - start
+            self._stats["checkouts"] += 1
+            self._stats["waits"] += int(waited)
+            self._stats["wait_time"] += wait_time
+            self._stats["wait_time_max"] = max(
+                self._stats["wait_time_max"], wait_time)
         if connection is None:
             connection = self._new(url)
         return connection
@@ -83,6 +120,25 @@ class ConnectionPool:
         components = urllib.parse.urlparse(url)
         return "{}:{}".format(components.scheme, components.netloc)
 
+    def _get_wakeup(self, key):
+        """Return condition to wait on for connections to `key`."""
+        # Use a condition per host so that notifying wakes up
+        # a thread waiting for the host, not any other host.
+        if key not in self._wakeups:
+            self._wakeups[key] = threading.Condition(self._lock)
+        return self._wakeups[key]
+
+    @pan.util.locked_method
+    def get_stats(self):
+        """
+        Return statistics of connection checkouts.
+
+        Return a dictionary of the amount of checkouts, the amount of those
+        that had to wait for a connection to be available and the total and
+        maximum time in seconds spent waiting.
+        """
+        return dict(self._stats)
+
     def is_alive(self):
         """Return ``True`` if pool is in use."""
         return self._alive
@@ -101,15 +157,19 @@ class ConnectionPool:
         # https://github.com/otsaloma/poor-maps/issues/23
         timeout = (600 if RE_LOCALHOST.search(url) else 15)
         connection = cls(components.netloc, timeout=timeout)
-        self._all_connections.add(connection)
+        with self._lock:
+            self._all_connections.add(connection)
         return connection
 
     def put(self, url, connection):
         """Return `connection` to the pool of connections."""
         if not self._alive: return
         key = self._get_key(url)
-        self._queue[key].task_done()
-        self._queue[key].put(connection)
+        with self._lock:
+            self._busy[key] = max(0, self._busy.get(key, 0) - 1)
+            if connection is not None:
+                self._idle.setdefault(key, []).append((connection, time.time()))
+            self._get_wakeup(key).notify()
 
     def reset(self, url):
         """Close and re-establish HTTP connection to `url`."""
@@ -119,6 +179,13 @@ class ConnectionPool:
             connection.close()
         self.put(url, None)
 
+    @pan.util.locked_method
+    def set_limit(self, url, threads):
+        """Set the maximum amount of connections to the host of `url`."""
+        key = self._get_key(url)
+        self._limits[key] = threads
+        self._get_wakeup(key).notify_all()
+
     @pan.util.locked_method
     def terminate(self):
         """Close all connections and terminate."""
@@ -126,50 +193,237 @@ class ConnectionPool:
         for connection in self._all_connections:
             with pan.util.silent(Exception):
                 connection.close()
-        # Mark as dead so that subsequent operations fail.
+        # Mark as dead so that subsequent operations fail
+        # and wake up all threads waiting for a connection.
         self._alive = False
+        for wakeup in self._wakeups.values():
+            wakeup.notify_all()
+
 
+pool = ConnectionPool(4)
+
+# Parsed data and validators of the latest
+# responses to JSON GET requests by URL.
+_cache = collections.OrderedDict()
+_cache_lock = threading.Lock()
+_cache_size = 32
+
+
+def _add_validators(method, url, headers=None):
+    """
+    Return `headers` for a conditional request and cached response.
+
+    For GET requests with a cached response to `url`, validators of that
+    response are added to a copy of `headers`. Return a tuple of headers
+    and :class:`CachedResponse` or ``None``.
+    """
+    headers = dict(headers or {})
+    cached = None
+    if method == "GET":
+        cached = _cache_get(url)
+        if cached is not None:
+            headers.update(cached.validators)
+    return headers, cached
 
-pool = ConnectionPool(1)
+def _cache_get(url):
+    """Return :class:`CachedResponse` for `url` or ``None``."""
+    with _cache_lock:
+        if url not in _cache: return None
+        _cache.move_to_end(url)
+        return _cache[url]
 
+def _cache_put(url, headers, data):
+    """Store `data` and validators from response `headers` for `url`."""
+    validators = {}
+    if headers.get("ETag"):
+        validators["If-None-Match"] = headers["ETag"]
+    if headers.get("Last-Modified"):
+        validators["If-Modified-Since"] = headers["Last-Modified"]
+    with _cache_lock:
+        _cache.pop(url, None)
+        if not validators: return
+        _cache[url] = CachedResponse(validators, data)
+        while len(_cache) > _cache_size:
+            _cache.popitem(last=False)
 
-def get(url, encoding=None, retry=1, headers=None):
+def gather_json(urls, encoding="utf_8", retry=1, headers=None, compress=True, return_exceptions=False):
+    """
+    Make HTTP GET requests at `urls` concurrently, return responses parsed as JSON.
+
+    See :func:`pan.asynchttp.gather_json`. On Python 3.4, which lacks
+    ``async`` and ``await`` used by :mod:`pan.asynchttp`, requests are made
+    one at a time instead.
+    """
+    if sys.version_info < (3, 5):
+        results = []
+        for url in urls:
+            try:
+                results.append(get_json(url, encoding, retry, headers, compress))
+            except Exception as error:
+                if not return_exceptions: raise # Exception
+                results.append(error)
+        return results
+    # asynchttp pulls in asyncio, import only when needed.
+    import pan.asynchttp
+    return pan.asynchttp.gather_json(urls,
+                                     encoding=encoding,
+                                     retry=retry,
+                                     headers=headers,
+                                     compress=compress,
+                                     return_exceptions=return_exceptions)
+
+def get(url, encoding=None, retry=1, headers=None, compress=True):
     """Make a HTTP GET request at `url` and return response."""
     return _request("GET",
                     url,
                     body=None,
                     encoding=encoding,
                     retry=retry,
-                    headers=headers)
+                    headers=headers,
+                    compress=compress)
+
+def _get_body(method, response, encoding=None):
+    """Return body of `response` or raise :exc:`Exception` if not successful."""
+    if not 200 <= response.status <= 299:
+        message = "Server responded {}: {}".format(
+            repr(response.status), repr(response.reason))
+        print("{} failed: {}".format(method, message), file=sys.stderr)
+        raise Exception(message)
+    if encoding is None: return response.body
+    return response.body.decode(encoding, errors="replace")
 
-def get_json(url, encoding="utf_8", retry=1, headers=None):
+def get_json(url, encoding="utf_8", retry=1, headers=None, compress=True):
     """Make a HTTP GET request at `url` and return response parsed as JSON."""
     return _request_json("GET",
                          url,
                          body=None,
                          encoding=encoding,
                          retry=retry,
-                         headers=headers)
+                         headers=headers,
+                         compress=compress)
+
+def _decompress(chunks, encoding):
+    """Iterate over `chunks` of body decompressed according to `encoding`."""
+    encoding = (encoding or "").strip().lower()
+    if encoding not in ("deflate", "gzip"):
+        yield from chunks
+        return
+    # Decompress the body in chunks as it arrives to avoid holding
+    # both the whole compressed and decompressed body in memory.
+    wbits = (16 + zlib.MAX_WBITS if encoding == "gzip" else zlib.MAX_WBITS)
+    decompressor = zlib.decompressobj(wbits)
+    first = True
+    for chunk in chunks:
+        try:
+            yield decompressor.decompress(chunk)
+        except zlib.error:
+            # Some servers send deflate data without the zlib header.
+            if not (first and encoding == "deflate"): raise
+            decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            yield decompressor.decompress(chunk)
+        first = False
+    yield decompressor.flush()
+
+def _iter_body(response):
+    """Iterate over chunks of `response` body, decompressed if needed."""
+    def read():
+        while True:
+            chunk = response.read(CHUNK_SIZE)
+            if not chunk: break
+            pan.metrics.registry.count("http.bytes_received", len(chunk))
+            yield chunk
+    encoding = response.headers.get("Content-Encoding", "")
+    return _decompress(read(), encoding)
+
+def _is_blank(response):
+    """Return ``True`` if `response` is successful, but blank."""
+    return (200 <= response.status <= 299 and
+            not response.body.strip())
+
+def iter_json(url, path="item", encoding="utf_8", retry=1, headers=None, compress=True):
+    """
+    Make a HTTP GET request at `url` and iterate over items of JSON response.
+
+    `path` is the location of the items in the response, see
+    :func:`pan.jsonlib.iter_items`. The response is parsed incrementally as
+    it arrives, so that the whole response is never held in memory at once.
+    Unlike :func:`get_json`, requests are not conditional.
+    """
+    response = _request_response("GET", url, None, retry, headers, compress, stream=True)
+    connection, body = response.body
+    done = False
+    try:
+        # Raise on an unsuccessful status.
+        _get_body("GET", response._replace(body=None))
+        try:
+            yield from pan.jsonlib.iter_items(_iter_body(body), path, encoding)
+        except ValueError as error:
+            name = error.__class__.__name__
+            print("Failed to parse JSON data: {}: {}"
+                  .format(name, str(error)),
+                  file=sys.stderr)
+            raise # ValueError
+        done = True
+    finally:
+        # Reuse the connection only if the whole response was read,
+        # not if the caller stopped iterating or an error occurred.
+        if not done:
+            with pan.util.silent(Exception):
+                connection.close()
+        pool.put(url, connection if done else None)
+
+def _parse_json(method, url, response, cached=None, encoding="utf_8"):
+    """
+    Return data of `response` to request at `url` parsed as JSON.
+
+    If `response` is 304 Not Modified to a conditional request, return data
+    of `cached` response as-is. Otherwise store data and validators of
+    `response` to GET requests for the next conditional request.
+    """
+    if cached is not None and response.status == 304:
+        print("{} {}: Not modified".format(method, url))
+        pan.metrics.registry.count("http.cache.hits")
+        return cached.data
+    if method == "GET":
+        pan.metrics.registry.count("http.cache.misses")
+    # Parse bytes directly, decoding to text only if not UTF-8.
+    blob = _get_body(method, response)
+    try:
+        if not blob.strip():
+            raise ValueError("Expected JSON, received blank")
+        with pan.metrics.registry.timed("http.parse_time"):
+            data = pan.jsonlib.loads(blob, encoding)
+    except Exception as error:
+        name = error.__class__.__name__
+        print("Failed to parse JSON data: {}: {}"
+              .format(name, str(error)),
+              file=sys.stderr)
+        raise # Exception
+    if method == "GET":
+        _cache_put(url, response.headers, data)
+    return data
 
-def post(url, body, encoding=None, retry=1, headers=None):
+def post(url, body, encoding=None, retry=1, headers=None, compress=True):
     """Make a HTTP POST request at `url` and return response."""
     return _request("POST",
                     url,
                     body=body,
                     encoding=encoding,
                     retry=retry,
-                    headers=headers)
+                    headers=headers,
+                    compress=compress)
 
-def post_json(url, body, encoding="utf_8", retry=1, headers=None):
+def post_json(url, body, encoding="utf_8", retry=1, headers=None, compress=True):
     """Make a HTTP POST request at `url` and return response parsed as JSON."""
     return _request_json("POST",
                          url,
                          body=body,
                          encoding=encoding,
                          retry=retry,
-                         headers=headers)
+                         headers=headers,
+                         compress=compress)
 
-def _request(method, url, body=None, encoding=None, retry=1, headers=None):
+def _request(method, url, body=None, encoding=None, retry=1, headers=None, compress=True):
     """
     Make a HTTP request at `url` using `method`.
 
@@ -179,9 +433,52 @@ def _request(method, url, body=None, encoding=None, retry=1, headers=None):
     If `encoding` is ``None``, return bytes, otherwise decode response data to
     text using `encoding`. Try again `retry` times in some particular cases
     that imply a connection error. `headers` should be a dictionary of custom
-    headers to add to the defaults :attr:`http.HEADERS`.
+    headers to add to the defaults :attr:`http.HEADERS`. If `compress` is
+    ``True``, ask for a gzip or deflate compressed response.
+    """
+    response = _request_response(method, url, body, retry, headers, compress)
+    return _get_body(method, response, encoding)
+
+def _request_json(method, url, body=None, encoding="utf_8", retry=1, headers=None, compress=True):
+    """
+    Make a HTTP request, return response parsed as JSON.
+
+    `method` should be the name of a HTTP method, e.g. "GET" or "POST". `body`
+    should be ``None`` for methods that don't expect data (e.g. GET) or the
+    data to send (usually a string) for methods that do expect data (e.g. POST).
+    If `encoding` is ``None``, return bytes, otherwise decode response data to
+    text using `encoding`. Try again `retry` times in some particular cases
+    that imply a connection error. `headers` should be a dictionary of custom
+    headers to add to the defaults :attr:`http.HEADERS`. If `compress` is
+    ``True``, ask for a gzip or deflate compressed response.
+
+    GET requests are conditional: validators of the previous response to
+    `url` are sent and if the server responds 304 Not Modified, the data
+    parsed from the previous response is returned as-is. Callers should
+    thus not modify the returned data.
+    """
+    headers, cached = _add_validators(method, url, headers)
+    response = _request_response(method, url, body, retry, headers, compress)
+    if _is_blank(response) and retry > 0:
+        # A blank return is probably an error.
+        pool.reset(url)
+        response = _request_response(method, url, body, retry, headers, compress)
+    return _parse_json(method, url, response, cached, encoding)
+
+def _request_response(method, url, body=None, retry=1, headers=None, compress=True, stream=False):
+    """
+    Make a HTTP request at `url` using `method`, return :class:`Response`.
+
+    The returned response can have any status, it is up to the caller to check
+    that. See :func:`_request` for the arguments. If `stream` is ``True``, the
+    body of the returned response is a tuple of the connection and the unread
+    :class:`http.client.HTTPResponse`, the caller needs to read the response
+    and return the connection to :attr:`pool`.
     """
     print("{} {}".format(method, url))
+    pan.metrics.registry.count("http.requests")
+    start = time.perf_counter()
+    streaming = False
     try:
         connection = pool.get(url)
         # Do relative requests (without scheme and netloc)
@@ -190,6 +487,8 @@ def _request(method, url, body=None, encoding=None, retry=1, headers=None):
         components = ("", "") + components[2:]
         path = urllib.parse.urlunparse(components)
         headall = HEADERS.copy()
+        if compress:
+            headall["Accept-Encoding"] = "gzip, deflate"
         headall.update(headers or {})
         if isinstance(body, str):
             # UTF-8 is likely to work in most cases,
@@ -197,18 +496,25 @@ def _request(method, url, body=None, encoding=None, retry=1, headers=None):
             body = body.encode("utf_8")
         connection.request(method, path, body, headers=headall)
         response = connection.getresponse()
+        pan.metrics.registry.observe("http.latency", time.perf_counter() - start)
+        if stream:
+            streaming = True
+            return Response(status=response.status,
+                            reason=response.reason,
+                            headers=response.headers,
+                            body=(connection, response))
         # Always read response to avoid
         # http.client.ResponseNotReady: Request-sent.
-        blob = response.read()
-        if not 200 <= response.status <= 299:
-            raise Exception("Server responded {}: {}".format(
-                repr(response.status), repr(response.reason)))
-        if encoding is None: return blob
-        return blob.decode(encoding, errors="replace")
+        blob = b"".join(_iter_body(response))
+        return Response(status=response.status,
+                        reason=response.reason,
+                        headers=response.headers,
+                        body=blob)
     except Exception as error:
         if not pool.is_alive(): raise
         connection.close()
         connection = None
+        pan.metrics.registry.count("http.errors")
         broken = tuple(BROKEN_CONNECTION_ERRORS)
         if not isinstance(error, broken) or retry == 0:
             name = error.__class__.__name__
@@ -220,33 +526,6 @@ def _request(method, url, body=None, encoding=None, retry=1, headers=None):
         # nor reraised an Exception, we move on to try again.
         assert retry > 0
     finally:
-        pool.put(url, connection)
-    return _request(method, url, body, encoding, retry-1, headers)
-
-def _request_json(method, url, body=None, encoding="utf_8", retry=1, headers=None):
-    """
-    Make a HTTP request, return response parsed as JSON.
-
-    `method` should be the name of a HTTP method, e.g. "GET" or "POST". `body`
-    should be ``None`` for methods that don't expect data (e.g. GET) or the
-    data to send (usually a string) for methods that do expect data (e.g. POST).
-    If `encoding` is ``None``, return bytes, otherwise decode response data to
-    text using `encoding`. Try again `retry` times in some particular cases
-    that imply a connection error. `headers` should be a dictionary of custom
-    headers to add to the defaults :attr:`http.HEADERS`.
-    """
-    text = _request(method, url, body, encoding, retry, headers)
-    if not text.strip() and retry > 0:
-        # A blank return is probably an error.
-        pool.reset(url)
-        text = _request(method, url, body, encoding, retry, headers)
-    try:
-        if not text.strip():
-            raise ValueError("Expected JSON, received blank")
-        return json.loads(text)
-    except Exception as error:
-        name = error.__class__.__name__
-        print("Failed to parse JSON data: {}: {}"
-              .format(name, str(error)),
-              file=sys.stderr)
-        raise # Exception
+        if not streaming:
+            pool.put(url, connection)
+    return _request_response(method, url, body, retry-1, headers, compress, stream)
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Identities of the stations of a network across updates."""
+
+import hashlib
+import types
+
+__all__ = ("IdentityTable",)
+
+
+class IdentityTable:
+
+    """
+    Identities of the stations of a network across updates.
+
+    Stations are kept as read-only dictionaries by id. On update, stations
+    that haven't changed are kept as-is, and changed stations share the
+    values of unchanged fields, e.g. name and coordinates, with the previous
+    version of the station. Keys, the MD5 hex digests of ids, are computed
+    only once per station. Stations are never modified in place, so that
+    stations already returned stay consistent. :attr:`moved` is ``True``
+    if the last update added, removed or moved stations, i.e. if indices
+    of positions of stations need to be rebuilt.
+    """
+
+    def __init__(self, stations=()):
+        """Initialize an :class:`IdentityTable` instance."""
+        # Stations from the cache have keys already.
+        self.stations = tuple(map(types.MappingProxyType, stations))
+        self._stations = {x["id"]: x for x in self.stations}
+        self.moved = True
+
+    def __len__(self):
+        """Return the amount of stations."""
+        return len(self.stations)
+
+    def update(self, stations):
+        """
+        Update the table to match `stations`.
+
+        `stations` should be a list of dictionaries with key "id" at least.
+        Return a list of ids of stations that were added, changed or removed.
+        Updated stations are available as :attr:`stations`.
+        """
+        changed = []
+        moved = False
+        old = self._stations
+        new = {}
+        items = []
+        for station in stations:
+            id = station["id"]
+            previous = old.get(id)
+            if previous is None:
+                key = hashlib.md5(bytes(id, "utf_8")).hexdigest()
+                item = types.MappingProxyType(dict(station, key=key))
+                changed.append(id)
+                moved = True
+            elif (len(previous) == len(station) + 1 and
+                  all(previous.get(k) == v for k, v in station.items())):
+                item = previous
+            else:
+                # Share values of unchanged fields with the previous
+                # version, not keeping duplicates of e.g. names.
+                item = {k: previous[k] if k in previous and previous[k] == v else v
+                        for k, v in station.items()}
+                item["key"] = previous["key"]
+                item = types.MappingProxyType(item)
+                changed.append(id)
+                if (item.get("x") != previous.get("x") or
+                    item.get("y") != previous.get("y")):
+                    moved = True
+            new[id] = item
+            items.append(item)
+        removed = [x for x in old if x not in new]
+        changed.extend(removed)
+        # Stations with duplicate ids can't be matched by id,
+        # rebuild indices as if moved to be safe.
+        self.moved = moved or bool(removed) or len(items) != len(new)
+        self.stations = tuple(items)
+        self._stations = new
+        return changed
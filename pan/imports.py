@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Deferred imports and profiling of import times.
+
+Set environment variable ``PAN_PROFILE_IMPORTS`` to record the time spent
+importing each module from the start of :mod:`pan`, similar to ``python3
+-X importtime``. Times are printed once :func:`pan.main` has run and are
+included in :meth:`pan.Application.get_stats`.
+"""
+
+# Keep imports here minimal, this module is imported first.
+import importlib
+import importlib.util
+import sys
+import threading
+import time
+
+__all__ = ("ImportProfiler", "LazyImport", "lazy_import", "start_profiling")
+
+# Active profiler or None, see start_profiling.
+profiler = None
+
+
+class ImportProfiler:
+
+    """
+    A meta path finder recording time spent importing modules.
+
+    Modules are found by the other finders of :data:`sys.meta_path` and
+    their loaders wrapped to time the execution of the module. "self" time
+    excludes and "cumulative" time includes the time of nested imports.
+    """
+
+    def __init__(self):
+        """Initialize an :class:`ImportProfiler` instance."""
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._times = {}
+
+    def find_spec(self, name, path=None, target=None):
+        """Return spec of module `name` with a timing loader or ``None``."""
+        if getattr(self._local, "finding", False): return None
+        self._local.finding = True
+        start = time.perf_counter()
+        try:
+            for finder in sys.meta_path:
+                if finder is self: continue
+                if not hasattr(finder, "find_spec"): continue
+                spec = finder.find_spec(name, path, target)
+                if spec is not None: break
+            else:
+                return None
+        finally:
+            self._local.finding = False
+        if spec.loader is None or not hasattr(spec.loader, "exec_module"):
+            return spec
+        spec.loader = _TimedLoader(spec.loader, self, time.perf_counter() - start)
+        return spec
+
+    def get_times(self, limit=None):
+        """Return a list of import times sorted by cumulative time."""
+        with self._lock:
+            times = [dict(cumulative=v[1], name=k, self=v[0])
+                     for k, v in self._times.items()]
+        times.sort(key=lambda x: x["cumulative"], reverse=True)
+        return times[:limit]
+
+    def install(self):
+        """Start recording imports."""
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def _record(self, name, elapsed):
+        """Record `elapsed` cumulative time spent importing `name`."""
+        stack = self._local.__dict__.setdefault("stack", [])
+        children = stack.pop()
+        if stack:
+            stack[-1] += elapsed
+        with self._lock:
+            self._times[name] = (elapsed - children, elapsed)
+
+    def uninstall(self):
+        """Stop recording imports."""
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+
+
+class LazyImport:
+
+    """A module imported on first access of its attributes."""
+
+    def __init__(self, name):
+        """Initialize a :class:`LazyImport` instance."""
+        self._module = None
+        self._name = name
+
+    def __getattr__(self, name):
+        """Return attribute `name` of the module."""
+        # Only called for attributes not found otherwise,
+        # i.e. never for those set in __init__ above.
+        if name.startswith("__"):
+            raise AttributeError(name)
+        if self._module is None:
+            # import_module is thread-safe and returns
+            # the same module if imported concurrently.
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, name)
+
+    def __repr__(self):
+        """Return a string representation of the deferred import."""
+        return "<LazyImport {}>".format(repr(self._name))
+
+
+class _TimedLoader:
+
+    """A wrapper of a loader to time the execution of modules."""
+
+    def __init__(self, loader, profiler, find_time):
+        """Initialize a :class:`_TimedLoader` instance."""
+        self._find_time = find_time
+        self._loader = loader
+        self._profiler = profiler
+
+    def __getattr__(self, name):
+        """Return attribute `name` of the wrapped loader."""
+        return getattr(self._loader, name)
+
+    def create_module(self, spec):
+        """Return a new module for `spec` or ``None`` for default."""
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module):
+        """Execute `module` and record the time taken."""
+        stack = self._profiler._local.__dict__.setdefault("stack", [])
+        stack.append(0)
+        start = time.perf_counter()
+        try:
+            self._loader.exec_module(module)
+        finally:
+            elapsed = time.perf_counter() - start + self._find_time
+            self._profiler._record(module.__name__, elapsed)
+
+
+def lazy_import(name):
+    """
+    Return a deferred import of module `name` or ``None``.
+
+    ``None`` is returned if the module is not installed, so that optional
+    dependencies can be checked for without the cost of importing them.
+    The module itself is imported on first access of its attributes.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    try:
+        if importlib.util.find_spec(name) is None:
+            return None
+    except (ImportError, ValueError):
+        return None
+    return LazyImport(name)
+
+def start_profiling():
+    """Start recording times of all subsequent imports."""
+    global profiler
+    if profiler is None:
+        profiler = ImportProfiler()
+        profiler.install()
@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Parsing JSON using the fastest available backend.
+
+orjson_ and simdjson_ are used if installed, falling back on :mod:`json`
+of the standard library. All backends return plain dictionaries, lists,
+strings and numbers and raise :exc:`ValueError` on invalid data.
+
+.. _orjson: https://github.com/ijl/orjson
+.. _simdjson: https://github.com/TkTech/pysimdjson
+"""
+
+import codecs
+import importlib
+import json
+import pan
+import re
+import sys
+
+# ijson is optional, used for streaming
+# if available, imported on first use.
+ijson = pan.imports.lazy_import("ijson")
+
+__all__ = ("iter_items", "loads")
+
+# Backends in order of preference.
+BACKENDS = ("orjson", "simdjson", "json")
+
+# Encodings that can be passed to backends as bytes as-is.
+UTF_8 = ("utf8", "utf_8", "utf-8")
+
+# Characters that can follow the decoded part of a number,
+# if up to the end of buffer, the number can continue.
+RE_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*\Z")
+
+RE_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+# True if the backend accepts bytes, i.e. except
+# the standard library json before Python 3.6.
+accepts_bytes = True
+
+backend = None
+_loads = None
+
+def get_backends():
+    """Return a list of names of available backends."""
+    backends = []
+    for name in BACKENDS:
+        try:
+            importlib.import_module(name)
+            backends.append(name)
+        except ImportError:
+            pass
+    return backends
+
+def iter_items(chunks, path, encoding="utf_8"):
+    """
+    Iterate over items at `path` of JSON data in `chunks` of bytes.
+
+    `path` is a prefix as used by ijson_, keys separated by dots and "item"
+    denoting the items of an array, e.g. "network.stations.item" for items
+    of the array "stations" of the object "network". Data is parsed
+    incrementally as chunks are consumed, only one item at a time is held
+    in memory. Raise :exc:`ValueError` on invalid data.
+
+    .. _ijson: https://github.com/ICRAR/ijson
+    """
+    if ijson is not None and (encoding or "utf_8").lower() in UTF_8:
+        try:
+            yield from ijson.items(_ChunkFile(chunks), path, use_float=True)
+        except ijson.JSONError as error:
+            raise ValueError(str(error)) from error
+        return
+    # Without ijson, find the items, descending only into objects
+    # and arrays along the path, and decode each using the standard
+    # library decoder as soon as enough chunks have been read.
+    reader = _ChunkReader(chunks, encoding or "utf_8")
+    yield from _iter_items(reader, path.split(".") if path else [])
+    if reader.peek():
+        raise ValueError("Extra data at {:d}".format(reader.pos))
+
+def _iter_items(reader, parts):
+    """Iterate over items at `parts` of path at `reader`."""
+    if not parts:
+        yield reader.decode()
+        return
+    char = reader.peek()
+    if char == "[" and parts[0] == "item":
+        reader.pos += 1
+        if reader.peek() == "]":
+            reader.pos += 1
+            return
+        while True:
+            yield from _iter_items(reader, parts[1:])
+            if reader.expect(",]") == "]": return
+    elif char == "{":
+        reader.pos += 1
+        if reader.peek() == "}":
+            reader.pos += 1
+            return
+        while True:
+            key = reader.decode()
+            reader.expect(":")
+            if key == parts[0]:
+                yield from _iter_items(reader, parts[1:])
+            else:
+                # Decode and discard values off the path.
+                reader.decode()
+            if reader.expect(",}") == "}": return
+    else:
+        # Not matching the path, no items to yield.
+        reader.decode()
+
+def loads(data, encoding="utf_8"):
+    """
+    Return `data` parsed as JSON.
+
+    `data` can be text or bytes. UTF-8 bytes are passed to the backend as-is
+    if it accepts bytes, avoiding an intermediate decoded copy of the text,
+    bytes in any other `encoding` are decoded first.
+    """
+    if isinstance(data, bytes):
+        encoding = encoding or "utf_8"
+        if not accepts_bytes or encoding.lower() not in UTF_8:
+            data = data.decode(encoding, errors="replace")
+    try:
+        return _loads(data)
+    except ValueError:
+        if not isinstance(data, bytes): raise
+        # Backends can be strict about invalid UTF-8,
+        # fall back on decoding with replacement characters.
+        data = data.decode("utf_8", errors="replace")
+        return json.loads(data)
+
+def set_backend(name=None):
+    """Use backend `name` or the first available one if ``None``."""
+    global accepts_bytes, backend, _loads
+    for candidate in ([name] if name else BACKENDS):
+        try:
+            module = importlib.import_module(candidate)
+        except ImportError:
+            if name is not None: raise
+            continue
+        # All backends provide a json-compatible loads.
+        _loads = module.loads
+        backend = candidate
+        accepts_bytes = (candidate != "json" or sys.version_info >= (3, 6))
+        return
+
+set_backend()
+
+
+class _ChunkFile:
+
+    """File-like reading of chunks of bytes."""
+
+    def __init__(self, chunks):
+        """Initialize a :class:`_ChunkFile` instance."""
+        self._buffer = b""
+        self._chunks = iter(chunks)
+
+    def read(self, size=-1):
+        """Return at most `size` bytes, empty at end."""
+        while size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None: break
+            self._buffer += chunk
+        if size < 0:
+            size = len(self._buffer)
+        data = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return data
+
+
+class _ChunkReader:
+
+    """Incremental decoding of JSON values from chunks of bytes."""
+
+    def __init__(self, chunks, encoding):
+        """Initialize a :class:`_ChunkReader` instance."""
+        self.buffer = ""
+        self.eof = False
+        self.pos = 0
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+        self._scanner = json.JSONDecoder()
+
+    def decode(self):
+        """Return the next value, reading more chunks as needed."""
+        while True:
+            if not self.peek():
+                raise ValueError("Unexpected end of data")
+            try:
+                value, end = self._scanner.raw_decode(self.buffer, self.pos)
+                # A number at the end of buffer can continue in the next
+                # chunk, also if split after a decimal point or exponent,
+                # which the decoder stops before.
+                if (self.eof or
+                    isinstance(value, bool) or
+                    not isinstance(value, (int, float)) or
+                    not RE_NUMBER_TAIL.match(self.buffer, end)):
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof: raise
+            # Double the amount of buffered data not to parse
+            # values spanning a lot of chunks over and over again.
+            self._fill(len(self.buffer) - self.pos)
+
+    def expect(self, chars):
+        """Return and skip the next character, which must be in `chars`."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError("Expected {} at {:d}, found {}"
+                             .format(repr(chars), self.pos, repr(char)))
+        self.pos += 1
+        return char
+
+    def _fill(self, size=1):
+        """Read at least `size` more characters, unless at end."""
+        self.buffer = self.buffer[self.pos:]
+        self.pos = 0
+        size = len(self.buffer) + max(1, size)
+        while len(self.buffer) < size and not self.eof:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                self.buffer += self._decoder.decode(b"", final=True)
+                self.eof = True
+            else:
+                self.buffer += self._decoder.decode(chunk)
+
+    def peek(self):
+        """Return the next non-whitespace character, empty at end."""
+        while True:
+            self.pos = RE_WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if self.eof: return ""
+            self._fill()
@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Counters and latency histograms of API calls and HTTP requests."""
+
+import collections
+import contextlib
+import math
+import threading
+import time
+
+__all__ = ("Histogram", "Registry")
+
+
+class Histogram:
+
+    """
+    Distribution of observed values, e.g. latencies in seconds.
+
+    Count, sum and maximum are kept of all observed values, percentiles
+    are calculated from the latest `size` values.
+    """
+
+    def __init__(self, size=1000):
+        """Initialize a :class:`Histogram` instance."""
+        self.count = 0
+        self.max = 0
+        self.sum = 0
+        self._values = collections.deque(maxlen=size)
+
+    def get_percentile(self, p):
+        """Return the `p`th percentile of latest values or ``None``."""
+        if not self._values: return None
+        values = sorted(self._values)
+        # Use the nearest-rank method.
+        rank = math.ceil(p / 100 * len(values))
+        return values[max(0, rank - 1)]
+
+    def get_summary(self):
+        """Return a dictionary of count, mean, maximum and percentiles."""
+        return dict(count=self.count,
+                    max=self.max,
+                    mean=self.sum / self.count if self.count else None,
+                    p50=self.get_percentile(50),
+                    p95=self.get_percentile(95),
+                    p99=self.get_percentile(99))
+
+    def observe(self, value):
+        """Add `value` to the distribution."""
+        self.count += 1
+        self.max = max(self.max, value)
+        self.sum += value
+        self._values.append(value)
+
+
+class Registry:
+
+    """
+    Named counters and histograms.
+
+    Names are dotted, e.g. "api.list_stations.calls", which :meth:`get_stats`
+    returns nested as ``stats["api"]["list_stations"]["calls"]``.
+    """
+
+    def __init__(self):
+        """Initialize a :class:`Registry` instance."""
+        self._counters = collections.defaultdict(int)
+        self._histograms = collections.defaultdict(Histogram)
+        self._lock = threading.Lock()
+
+    def count(self, name, value=1):
+        """Add `value` to counter `name`."""
+        with self._lock:
+            self._counters[name] += value
+
+    def get_stats(self):
+        """
+        Return a nested dictionary of counters and histograms.
+
+        Histograms are summarized as dictionaries, see
+        :meth:`Histogram.get_summary`. For groups of counters including
+        "hits" and "misses", "hit_ratio" is added.
+        """
+        stats = {}
+        with self._lock:
+            items = list(self._counters.items())
+            items += [(k, v.get_summary()) for k, v in self._histograms.items()]
+        for name, value in items:
+            *parents, leaf = name.split(".")
+            root = stats
+            for parent in parents:
+                root = root.setdefault(parent, {})
+            root[leaf] = value
+        def add_hit_ratios(root):
+            if isinstance(root.get("hits"), int) and isinstance(root.get("misses"), int):
+                total = root["hits"] + root["misses"]
+                root["hit_ratio"] = root["hits"] / total if total else None
+            for value in root.values():
+                if isinstance(value, dict):
+                    add_hit_ratios(value)
+        add_hit_ratios(stats)
+        return stats
+
+    def observe(self, name, value):
+        """Add `value` to histogram `name`."""
+        with self._lock:
+            self._histograms[name].observe(value)
+
+    def reset(self):
+        """Remove all counters and histograms."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    @contextlib.contextmanager
+    def timed(self, name):
+        """A context manager to observe time in seconds to histogram `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+
+registry = Registry()
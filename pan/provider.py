@@ -17,15 +17,13 @@
 
 """A proxy for information from providers."""
 
-import copy
-import hashlib
-import importlib.machinery
-import os
+import concurrent.futures
 import pan
-import random
+import pyotherside
 import re
-import statistics
+import threading
 import time
+import types
 
 __all__ = ("Provider",)
 
@@ -46,6 +44,10 @@ class BoundingBox:
         return (self.xmin < point["x"] < self.xmax and
                 self.ymin < point["y"] < self.ymax)
 
+    def to_tuple(self):
+        """Return bounding box as a tuple of xmin, xmax, ymin, ymax."""
+        return (self.xmin, self.xmax, self.ymin, self.ymax)
+
 
 class Provider:
 
@@ -63,31 +65,56 @@ class Provider:
         """Initialize a :class:`Provider` instance."""
         # Initialize properties only once.
         if hasattr(self, "id"): return
-        path, values = self._load_attributes(id)
+        path, values = pan.registry.providers.get(id)
         self.id = id
         self.name = values["name"]
+        self._flights = {}
+        self._lock = threading.Lock()
         self._networks = []
         self._path = path
-        self._provider = None
         self._stations = {}
-        self._stations_utime = -1
-        self._init_provider(id, re.sub(r"\.json$", ".py", path))
+        self._stations_utime = {}
+        self._tables = {}
+        self._timeout = values.get("timeout", None)
+        self._ttl = values.get("ttl", None)
+        self._viewports = {}
+        # Import the provider module only on first use, not at startup.
+        name = "pan.providers.{}".format(id)
+        path = re.sub(r"\.json$", ".py", path)
+        self._provider = pan.registry.LazyModule(name, path)
 
     def get_center(self, network):
         """Return coordinates of `network`'s center point."""
-        stations = self._stations.setdefault(network, [])
-        if not stations:
-            return dict(x=None, y=None)
-        x = [s["x"] for s in stations]
-        y = [s["y"] for s in stations]
-        return dict(x=statistics.mean(x), y=statistics.mean(y))
+        stations = self._stations.setdefault(network, pan.StationStore([]))
+        x, y = stations.get_center()
+        return dict(x=x, y=y)
+
+    def _get_stations(self, network):
+        """Return :class:`pan.StationStore` of `network`, updated if needed."""
+        if not self._stations.get(network):
+            # Use stations from the previous session if available,
+            # these will likely be stale and updated below.
+            stations, utime = pan.cache.read("stations", self.id, network)
+            if stations:
+                table = self._tables[network] = pan.IdentityTable(stations)
+                self._stations[network] = pan.StationStore(table.stations)
+                self._stations_utime[network] = utime
+        if not self._stations.setdefault(network, pan.StationStore([])):
+            self.update_stations(network, if_stale=True)
+        elif self.is_stale(network):
+            if pan.conf.stale_while_revalidate:
+                # Return cached stations and update in the background,
+                # the map will be notified once done.
+                self._update_stations_async(network)
+            else:
+                self.update_stations(network, if_stale=True)
+        return self._stations[network]
 
     def get_total_stations(self, network, bbox=None):
         """Return the total amount of bike stations for `network`."""
-        stations = self._stations.setdefault(network, [])
-        bbox = bbox or [-180, 180, -90, 90]
-        bbox = BoundingBox(*bbox)
-        return sum(map(bbox.contains, stations))
+        stations = self._stations.setdefault(network, pan.StationStore([]))
+        if not bbox: return stations.count()
+        return stations.count(BoundingBox(*bbox).to_tuple())
 
     @property
     def info_qml_uri(self):
@@ -95,48 +122,217 @@ class Provider:
         path = re.sub(r"\.json$", "_info.qml", self._path)
         return pan.util.path2uri(path)
 
-    def _init_provider(self, id, path):
-        """Initialize transit provider module from `path`."""
-        name = "pan.provider{:d}".format(random.randrange(10**12))
-        loader = importlib.machinery.SourceFileLoader(name, path)
-        self._provider = loader.load_module(name)
+    def is_stale(self, network):
+        """Return ``True`` if stations of `network` need to be updated."""
+        utime = self._stations_utime.get(network, -1)
+        return time.time() - utime > self.ttl
 
     @pan.util.api_query([])
-    def list_networks(self, x=0, y=0):
-        """Return a list of bike networks."""
+    def list_networks(self, x=0, y=0, limit=None, offset=0):
+        """Return a list of bike networks sorted by distance."""
         if not self._networks:
+            networks, utime = pan.cache.read("networks", self.id)
+            if networks:
+                # Use networks from the previous session
+                # and update those in the background.
+                self._networks = freeze(networks)
+                self._update_networks_async()
+            else:
+                self.update_networks(if_stale=True)
+        networks = pan.util.sorted_by_distance(
+            self._networks, x, y, limit, offset)
+        return list(map(dict, networks))
+
+    @pan.util.api_query([])
+    def list_clusters(self, network, bbox=None, zoom=None):
+        """
+        Return a list of clusters of bike stations for `network`.
+
+        Clusters aggregate all stations inside `bbox` into a bounded amount
+        of cells at `zoom`, see :meth:`pan.ClusterTree.list`.
+        """
+        bbox = BoundingBox(*(bbox or [-180, 180, -90, 90])).to_tuple()
+        return self._get_stations(network).list_clusters(bbox, zoom)
+
+    @pan.util.api_query([])
+    def list_stations(self, network, bbox=None):
+        """Return a list of bike stations for `network`."""
+        return self._list_stations(network, self._get_stations(network), bbox)
+
+    def _list_stations(self, network, store, bbox=None):
+        """Return a list of bike stations of `network` in `store`."""
+        bbox = list(bbox or [-180, 180, -90, 90])
+        bboxes = [BoundingBox(*(bbox + [x])).to_tuple() for x in [0.2, 0.1, 0]]
+        # Consecutive calls while panning the map overlap heavily,
+        # use the previous viewport to only look up the difference.
+        stations, self._viewports[network] = store.list_incremental(
+            bboxes, pan.conf.max_stations, self._viewports.get(network))
+        return stations
+
+    @pan.util.api_query({})
+    def query_viewport(self, network, bbox=None, fields=None, zoom=None):
+        """
+        Return a dictionary of `fields` of `network` within `bbox`.
+
+        `fields` should be a list of names of the following, by default all
+        but "clusters". "stations" is the list of stations as from
+        :meth:`list_stations`, "visible" the amount of those, "total" the
+        amount of stations inside `bbox` and "center" the network's center
+        point as a dictionary of "x" and "y". If "clusters" is requested and
+        `bbox` contains more than :attr:`pan.conf.max_stations` stations,
+        "clusters" is the list of clusters at `zoom` as from
+        :meth:`list_clusters` and "stations" is empty, otherwise "clusters"
+        is empty. All fields are computed from the same data.
+        """
+        fields = fields or ["center", "stations", "total", "visible"]
+        store = self._get_stations(network)
+        result = {}
+        if "clusters" in fields or "stations" in fields or "visible" in fields:
+            stations = self._list_stations(network, store, bbox)
+        if "clusters" in fields or "total" in fields:
+            # Count stations using those already looked up above, if any.
+            viewport = self._viewports.get(network)
+            total = store.count(
+                BoundingBox(*bbox).to_tuple() if bbox else None, viewport)
+        if "clusters" in fields:
+            result["clusters"] = []
+            if total > pan.conf.max_stations:
+                # Too many stations to show individually, cluster
+                # all of them instead of showing an arbitrary sample.
+                result["clusters"] = store.list_clusters(BoundingBox(
+                    *(bbox or [-180, 180, -90, 90])).to_tuple(), zoom)
+                stations = []
+        if "stations" in fields:
+            result["stations"] = stations
+        if "visible" in fields:
+            result["visible"] = len(stations)
+        if "total" in fields:
+            result["total"] = total
+        if "center" in fields:
+            x, y = store.get_center()
+            result["center"] = dict(x=x, y=y)
+        return result
+
+    def _single_flight(self, key, function):
+        """
+        Return the value of calling `function`.
+
+        Concurrent calls with the same `key` wait for the call already in
+        progress and share its return value or exception, instead of each
+        calling `function`.
+        """
+        with self._lock:
+            future = self._flights.get(key)
+            leader = future is None
+            if leader:
+                future = self._flights[key] = concurrent.futures.Future()
+        if not leader:
+            pan.metrics.registry.count("provider.{}.coalesced".format(self.id))
+            return future.result()
+        try:
+            future.set_result(function())
+        except Exception as error:
+            future.set_exception(error)
+        finally:
+            with self._lock:
+                del self._flights[key]
+        return future.result()
+
+    @property
+    def timeout(self):
+        """Return the time in seconds to wait for a list of networks."""
+        return self._timeout or pan.conf.provider_timeout
+
+    @property
+    def ttl(self):
+        """Return the time in seconds to consider stations fresh."""
+        # Provider definitions can override the global default,
+        # e.g. to match the update interval of the data source.
+        return self._ttl or pan.conf.ttl
+
+    def update_networks(self, if_stale=False):
+        """
+        Download and store the list of bike networks.
+
+        Concurrent calls share a single download. If `if_stale` is ``True``,
+        skip the download if networks have already been downloaded, e.g. by
+        a concurrent call that finished after the caller checked.
+        """
+        def update():
+            if if_stale and self._networks: return
+            # Provider modules download using pan.http, imported only here,
+            # since it pulls in http.client and ssl not needed at startup.
+            import pan.http
             networks = self._provider.list_networks()
             for network in networks:
                 network["provider_id"] = self.id
                 network["provider_name"] = self.name
-            self._networks = networks
-        networks = copy.deepcopy(self._networks)
-        return pan.util.sorted_by_distance(networks, x, y)
+            self._networks = freeze(networks)
+            pan.cache.write(networks, "networks", self.id)
+        return self._single_flight(("networks",), update)
 
-    @pan.util.api_query([])
-    def list_stations(self, network, bbox=None):
-        """Return a list of bike stations for `network`."""
-        bbox = bbox or [-180, 180, -90, 90]
-        if (not self._stations.setdefault(network, []) or
-            time.time() - self._stations_utime > 60):
-            stations = self._provider.list_stations(network)
-            for station in stations:
-                id = bytes(station["id"], "utf_8")
-                station["key"] = hashlib.md5(id).hexdigest()
-            self._stations[network] = stations
-            self._stations_utime = time.time()
-        stations = copy.deepcopy(self._stations[network])
-        for buffer in [0.2, 0.1, 0]:
-            buffered = BoundingBox(*(bbox + [buffer]))
-            stations = list(filter(buffered.contains, stations))
-            if len(stations) <= pan.conf.max_stations: break
-        stations.sort(key=lambda x: x["key"])
-        return stations[:pan.conf.max_stations]
-
-    def _load_attributes(self, id):
-        """Read and return attributes from JSON file."""
-        leaf = os.path.join("providers", "{}.json".format(id))
-        path = os.path.join(pan.DATA_HOME_DIR, leaf)
-        if not os.path.isfile(path):
-            path = os.path.join(pan.DATA_DIR, leaf)
-        return path, pan.util.read_json(path)
+    def _update_networks_async(self):
+        """Update the list of bike networks in a background thread."""
+        def update():
+            with pan.util.silent(Exception, tb=True):
+                self.update_networks()
+        threading.Thread(target=update, daemon=True).start()
+
+    def update_stations(self, network, if_stale=False):
+        """
+        Download and store stations of `network`.
+
+        Return a list of ids of stations that were added, changed or removed,
+        empty if none. Concurrent calls share a single download. If
+        `if_stale` is ``True``, skip the download if stations are no longer
+        stale, e.g. due to a concurrent call that finished after the caller
+        checked.
+        """
+        def update():
+            if (if_stale and
+                self._stations.get(network) and
+                not self.is_stale(network)): return []
+            import pan.http
+            table = self._tables.setdefault(network, pan.IdentityTable())
+            changed = table.update(self._provider.list_stations(network))
+            stations = self._stations.get(network)
+            if not stations or table.moved:
+                stations = pan.StationStore(table.stations)
+                if len(stations) > pan.conf.max_stations:
+                    # Build clusters here in the background
+                    # rather than on the first query of them.
+                    stations.get_clusters()
+                self._stations[network] = stations
+            elif changed:
+                # With only occupancy changed, keep the index
+                # and aggregate only counts of clusters again.
+                self._stations[network] = stations.replace(table.stations)
+            self._stations_utime[network] = time.time()
+            return changed
+        return self._single_flight(("stations", network), update)
+
+    def _update_stations_async(self, network):
+        """Update stations of `network` in a background thread."""
+        # Avoid piling up threads to wait for an update in progress.
+        if ("stations", network) in self._flights: return
+        def update():
+            with pan.util.silent(Exception, tb=True):
+                if self.update_stations(network, if_stale=True):
+                    pyotherside.send("stations-updated", self.id, network)
+        threading.Thread(target=update, daemon=True).start()
+
+    def write_cache(self):
+        """Write stations of all downloaded networks to cache files."""
+        for network, stations in list(self._stations.items()):
+            if not stations: continue
+            utime = self._stations_utime.get(network, -1)
+            stations = list(map(dict, stations))
+            pan.cache.write(stations, "stations", self.id, network, utime=utime)
+
+
+def freeze(items):
+    """Return a tuple of read-only views of dictionaries in `items`."""
+    # Items are flat dictionaries of scalars. Cached items are kept
+    # read-only so that callers can't corrupt the cache, and only items
+    # actually returned need to be copied, which is a shallow dict(item).
+    return tuple(map(types.MappingProxyType, items))
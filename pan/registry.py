@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Cached attributes and lazily imported modules of providers.
+
+Provider definitions are JSON files under the "providers" directories of
+:attr:`pan.DATA_HOME_DIR` and :attr:`pan.DATA_DIR`, local definitions
+overriding global ones. Attributes are read once and read again only if
+the modification time of the directory or the file changes.
+"""
+
+import importlib.util
+import os
+import pan
+import threading
+import types
+
+__all__ = ("LazyModule", "ProviderRegistry")
+
+
+class LazyModule:
+
+    """A module imported from file on first access of its attributes."""
+
+    def __init__(self, name, path):
+        """Initialize a :class:`LazyModule` instance."""
+        self._lock = threading.Lock()
+        self._module = None
+        self._name = name
+        self._path = path
+
+    def __getattr__(self, name):
+        """Return attribute `name` of the module."""
+        # Only called for attributes not found otherwise,
+        # i.e. never for those set in __init__ above.
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+    def load(self):
+        """Import the module if not already imported and return it."""
+        with self._lock:
+            if self._module is None:
+                spec = importlib.util.spec_from_file_location(self._name, self._path)
+                module = self._new_module(spec)
+                spec.loader.exec_module(module)
+                self._module = module
+            return self._module
+
+    def _new_module(self, spec):
+        """Return a new, empty module for `spec`."""
+        if hasattr(importlib.util, "module_from_spec"):
+            return importlib.util.module_from_spec(spec)
+        # module_from_spec is new in Python 3.5, on 3.4 set the
+        # attributes it would set that provider modules can use.
+        module = types.ModuleType(spec.name)
+        module.__file__ = spec.origin
+        module.__loader__ = spec.loader
+        module.__spec__ = spec
+        return module
+
+
+class ProviderRegistry:
+
+    """Cached attributes of installed providers."""
+
+    def __init__(self):
+        """Initialize a :class:`ProviderRegistry` instance."""
+        self._directories = {}
+        self._files = {}
+        self._lock = threading.Lock()
+        self._providers = {}
+
+    def get(self, pid):
+        """Return a tuple of path and attributes of provider `pid`."""
+        with self._lock:
+            self._update()
+            if pid not in self._providers:
+                raise ValueError("Provider {} not found".format(repr(pid)))
+            path, attributes = self._providers[pid]
+        return path, dict(attributes)
+
+    def list(self):
+        """Return a list of attributes of providers sorted by name."""
+        with self._lock:
+            self._update()
+            providers = list(self._providers.items())
+        providers = [dict(attributes, pid=pid)
+                     for pid, (path, attributes) in providers]
+        providers.sort(key=lambda x: x["name"])
+        return providers
+
+    def _list_directory(self, directory):
+        """Return a list of names of JSON files in `directory`."""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except OSError:
+            return []
+        cached = self._directories.get(directory)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        names = sorted(x for x in os.listdir(directory)
+                       if x.endswith(".json") and not x.startswith("."))
+        self._directories[directory] = (mtime, names)
+        return names
+
+    def _read(self, path):
+        """Return attributes from JSON file at `path`."""
+        stat = os.stat(path)
+        mtime = (stat.st_mtime_ns, stat.st_size)
+        cached = self._files.get(path)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        attributes = pan.util.read_json(path)
+        self._files[path] = (mtime, attributes)
+        return attributes
+
+    def _update(self):
+        """Update attributes of providers with changed files."""
+        providers = {}
+        for parent in (pan.DATA_HOME_DIR, pan.DATA_DIR):
+            directory = os.path.join(parent, "providers")
+            for name in self._list_directory(directory):
+                pid = name[:-len(".json")]
+                # Local definitions override global ones.
+                if pid in providers: continue
+                path = os.path.join(directory, name)
+                providers[pid] = (path, self._read(path))
+        self._providers = providers
+
+
+providers = ProviderRegistry()
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Background updates of the stations of the current network."""
+
+import pan
+import pyotherside
+import threading
+
+__all__ = ("Scheduler",)
+
+
+class Scheduler(threading.Thread):
+
+    """
+    Background updates of the stations of the current network.
+
+    Stations are updated once stale and ``stations-updated`` is sent to QML
+    only if stations or their occupancy have changed. No updates are done
+    while the scheduler is not :attr:`active`, e.g. when the application is
+    in the background and neither the map nor the cover is visible.
+    """
+
+    def __init__(self, app, interval=5):
+        """Initialize a :class:`Scheduler` instance."""
+        threading.Thread.__init__(self, daemon=True)
+        self.active = True
+        self._app = app
+        self._interval = interval
+        self._stopped = threading.Event()
+
+    def run(self):
+        """Update stations until stopped."""
+        while not self._stopped.wait(self._interval):
+            if not self.active: continue
+            with pan.util.silent(Exception, tb=True):
+                self.update()
+
+    def stop(self):
+        """Stop updating, return immediately."""
+        self._stopped.set()
+
+    def update(self):
+        """Update stations of the current network if stale."""
+        provider = self._app.provider
+        network = pan.conf.network
+        if provider is None: return
+        if not provider.is_stale(network): return
+        if provider.update_stations(network, if_stale=True):
+            pyotherside.send("stations-updated", provider.id, network)
@@ -0,0 +1,263 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Indexed storage of the stations of a network."""
+
+import collections
+import copy
+import pan
+
+numpy = pan.imports.lazy_import("numpy")
+
+# Only used without NumPy, imported on first use.
+statistics = pan.imports.lazy_import("statistics")
+
+__all__ = ("StationStore",)
+
+# Minimum amount of stations in the previous viewport to look up only the
+# difference to it, for smaller viewports a full query is faster.
+INCREMENTAL_THRESHOLD = 1000
+
+# State of the previous query, used to answer the next one incrementally.
+# `indices` are those of stations inside `bbox`, in the order of their keys.
+Viewport = collections.namedtuple("Viewport", "store bbox indices")
+
+
+class StationStore:
+
+    """
+    Indexed storage of the stations of a network.
+
+    `stations` should be read-only dictionaries with keys "x", "y" and "key"
+    at least. Stations are indexed in a :class:`pan.Grid` and, if NumPy is
+    available, coordinates and keys are also stored as parallel arrays in
+    the same order as :attr:`stations`, so that the stations themselves
+    serve as the table of identities and names. When only the occupancy of
+    stations changes, use :meth:`replace` to keep the index.
+    """
+
+    def __init__(self, stations):
+        """Initialize a :class:`StationStore` instance."""
+        self._grid = pan.Grid(stations)
+        self.stations = self._grid.items
+        self._center = None
+        self._clusters = None
+        self._key = None
+        self._positions = None
+        self._rank = None
+        self._x = None
+        self._y = None
+        if numpy is not None and self.stations:
+            self._init_columns()
+
+    def __iter__(self):
+        """Iterate over all stations."""
+        return iter(self.stations)
+
+    def __len__(self):
+        """Return the amount of stations."""
+        return len(self.stations)
+
+    def count(self, bbox=None, viewport=None):
+        """
+        Return the amount of stations inside `bbox`.
+
+        If `viewport` is one returned by :meth:`list_incremental` on this
+        store, or one it replaced, and contains `bbox`, only stations of
+        `viewport` are counted.
+        """
+        if bbox is None:
+            return len(self.stations)
+        if self._x is None:
+            return len(self._grid.query(*bbox))
+        if viewport is not None and self._is_same_index(viewport.store):
+            xmin, xmax, ymin, ymax = bbox
+            vxmin, vxmax, vymin, vymax = viewport.bbox
+            if (xmin >= vxmin and xmax <= vxmax and
+                ymin >= vymin and ymax <= vymax):
+                return len(self._filter(viewport.indices, bbox))
+        return len(self._filter(self._get_candidates(bbox), bbox))
+
+    def _filter(self, indices, bbox):
+        """Return those of `indices` strictly inside `bbox`."""
+        xmin, xmax, ymin, ymax = bbox
+        x = self._x[indices]
+        y = self._y[indices]
+        return indices[(x > xmin) & (x < xmax) & (y > ymin) & (y < ymax)]
+
+    def _get_candidates(self, bbox):
+        """Return an array of indices of candidate stations for `bbox`."""
+        slices = self._grid.query_slices(*bbox)
+        if not slices:
+            return numpy.zeros(0, dtype=numpy.intp)
+        return numpy.concatenate([numpy.arange(a, b) for a, b in slices])
+
+    def _get_entered(self, bbox, previous):
+        """Return indices of stations inside `bbox`, but not `previous`."""
+        # Only strips of `bbox` outside `previous` need to be looked up,
+        # stations that left are dropped by filtering previous results.
+        xmin, xmax, ymin, ymax = bbox
+        pxmin, pxmax, pymin, pymax = previous
+        strips = []
+        if xmin < pxmin:
+            strips.append((xmin, pxmin, ymin, ymax))
+        if xmax > pxmax:
+            strips.append((pxmax, xmax, ymin, ymax))
+        cxmin, cxmax = max(xmin, pxmin), min(xmax, pxmax)
+        if cxmin < cxmax and ymin < pymin:
+            strips.append((cxmin, cxmax, ymin, pymin))
+        if cxmin < cxmax and ymax > pymax:
+            strips.append((cxmin, cxmax, pymax, ymax))
+        if not strips:
+            return numpy.zeros(0, dtype=numpy.intp)
+        indices = numpy.unique(numpy.concatenate(
+            [self._get_candidates(x) for x in strips]))
+        indices = self._filter(indices, bbox)
+        x = self._x[indices]
+        y = self._y[indices]
+        inside = (x > pxmin) & (x < pxmax) & (y > pymin) & (y < pymax)
+        return indices[~inside]
+
+    def get_center(self):
+        """Return mean coordinates of stations as a tuple of x and y."""
+        if not self.stations:
+            return None, None
+        if self._center is not None:
+            return self._center
+        if self._x is None:
+            x = statistics.mean(s["x"] for s in self.stations)
+            y = statistics.mean(s["y"] for s in self.stations)
+        else:
+            x = float(self._x.mean())
+            y = float(self._y.mean())
+        # Stations are never modified, cache.
+        self._center = (x, y)
+        return self._center
+
+    def get_clusters(self):
+        """Return :class:`pan.ClusterTree` of stations."""
+        # Stations are never modified, build once on first use.
+        if self._clusters is None:
+            self._clusters = pan.ClusterTree(self.stations)
+        return self._clusters
+
+    def _get_positions(self):
+        """Return a dictionary mapping keys to indices of stations."""
+        # Positions are shared by replaced stores, build once on first use.
+        if self._positions is None:
+            self._positions = {x["key"]: i for i, x in enumerate(self.stations)}
+        return self._positions
+
+    def _init_columns(self):
+        """Initialize arrays of coordinates and keys."""
+        self._key = numpy.array([s["key"] for s in self.stations])
+        # Rank of each station in the order of keys,
+        # ties broken by the order of stations.
+        order = numpy.argsort(self._key, kind="stable")
+        self._rank = numpy.empty(len(order), dtype=numpy.intp)
+        self._rank[order] = numpy.arange(len(order))
+        self._x = numpy.array([s["x"] for s in self.stations], dtype=float)
+        self._y = numpy.array([s["y"] for s in self.stations], dtype=float)
+
+    def _is_same_index(self, other):
+        """Return ``True`` if `other` shares the index of this store."""
+        # Columns are shared by stores replaced with new
+        # versions of stations, not copied or rebuilt.
+        return other is self or (self._key is not None and
+                                 other._key is self._key)
+
+    def list(self, bboxes, limit):
+        """
+        Return a list of at most `limit` stations.
+
+        `bboxes` should be a list of bounding boxes from the largest to the
+        smallest, the first of which containing at most `limit` stations is
+        used. If even the last contains more, stations are truncated in the
+        order of their keys. Returned stations are new, mutable dictionaries.
+        """
+        if self._x is None:
+            stations = self._grid.query(*bboxes[0])
+            for xmin, xmax, ymin, ymax in bboxes[1:]:
+                if len(stations) <= limit: break
+                stations = [s for s in stations if
+                            xmin < s["x"] < xmax and
+                            ymin < s["y"] < ymax]
+            stations.sort(key=lambda x: x["key"])
+            return list(map(dict, stations[:limit]))
+        return self.list_incremental(bboxes, limit)[0]
+
+    def list_clusters(self, bbox, zoom=None):
+        """Return a list of clusters inside `bbox` at `zoom`."""
+        return self.get_clusters().list(bbox, zoom)
+
+    def list_incremental(self, bboxes, limit, viewport=None):
+        """
+        Return a list of at most `limit` stations and a viewport.
+
+        Stations are the same as returned by :meth:`list`. If `viewport` is
+        one returned by an earlier call on this store, or one it replaced,
+        only stations that entered or left the viewport since are looked up.
+        The returned viewport is ``None`` if NumPy is not available.
+        """
+        if self._x is None:
+            return self.list(bboxes, limit), None
+        indices = self._query(bboxes[0], viewport)
+        viewport = Viewport(self, tuple(bboxes[0]), indices)
+        for bbox in bboxes[1:]:
+            if len(indices) <= limit: break
+            indices = self._filter(indices, bbox)
+        return [dict(self.stations[i]) for i in indices[:limit]], viewport
+
+    def replace(self, stations):
+        """
+        Return a new :class:`StationStore` of `stations`.
+
+        `stations` should be new versions of the stations of this store, in
+        any order, at the same positions, e.g. with updated occupancy. The
+        index, columns and center of this store are shared and clusters,
+        if already built, are only aggregated again.
+        """
+        positions = self._get_positions()
+        items = [None] * len(self.stations)
+        for station in stations:
+            i = positions.get(station["key"])
+            if i is None: break
+            items[i] = station
+        if len(stations) != len(items) or None in items:
+            raise ValueError("Stations differ from those of store")
+        store = copy.copy(self)
+        store._grid = self._grid.replace(items)
+        store.stations = store._grid.items
+        if self._clusters is not None:
+            store._clusters = self._clusters.replace(store.stations)
+        return store
+
+    def _query(self, bbox, viewport=None):
+        """Return indices of stations inside `bbox` in the order of keys."""
+        if (viewport is None or
+            not self._is_same_index(viewport.store) or
+            len(viewport.indices) < INCREMENTAL_THRESHOLD):
+            indices = self._filter(self._get_candidates(bbox), bbox)
+            return indices[numpy.argsort(self._rank[indices], kind="stable")]
+        kept = self._filter(viewport.indices, bbox)
+        entered = self._get_entered(bbox, viewport.bbox)
+        if not len(entered):
+            return kept
+        # Kept indices are already in the order of keys, which a stable
+        # sort, i.e. timsort, takes advantage of as a single run.
+        indices = numpy.concatenate((kept, entered))
+        return indices[numpy.argsort(self._rank[indices], kind="stable")]
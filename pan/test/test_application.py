@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pan.application
+import pan.test
+import time
+
+
+class TestApplication(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.app = pan.Application()
+        self.providers = [pan.Provider("citybikes"), pan.Provider("hsl")]
+        self.backups = [x.__dict__.copy() for x in self.providers]
+        self.sent = []
+        self.send = pan.application.pyotherside.send
+        pan.application.pyotherside.send = lambda *args: self.sent.append(args)
+        for provider in self.providers:
+            provider.list_networks = self.get_list_networks(provider.id)
+
+    def teardown_method(self, method):
+        self.app.provider.__dict__.pop("list_clusters", None)
+        self.app.provider.__dict__.pop("list_stations", None)
+        self.app.provider.__dict__.pop("query_viewport", None)
+        for provider, backup in zip(self.providers, self.backups):
+            provider.__dict__.clear()
+            provider.__dict__.update(backup)
+        pan.application.pyotherside.send = self.send
+        self.app._executor.shutdown(wait=False)
+
+    def get_list_networks(self, id, delay=0):
+        def list_networks(*args):
+            time.sleep(delay)
+            return [dict(id=id, x=24.94, y=60.17)]
+        return list_networks
+
+    def test_get_stats(self):
+        pan.metrics.registry.reset()
+        pan.metrics.registry.count("http.requests")
+        stats = self.app.get_stats()
+        assert stats["metrics"]["http"]["requests"] == 1
+        assert "checkouts" in stats["pool"]
+
+    def test_list_clusters(self):
+        self.app.provider.list_clusters = lambda *args: [dict(count=2)]
+        assert self.app.list_clusters() == [dict(count=2)]
+
+    def test_query_viewport(self):
+        result = dict(stations=[dict(id="1")], total=1)
+        self.app.provider.query_viewport = lambda *args: dict(result)
+        assert self.app.query_viewport() == result
+        result = self.app.query_viewport(version="")
+        assert result["stations"]["added"] == [dict(id="1")]
+        assert result["total"] == 1
+
+    def test_list_networks(self):
+        networks = self.app.list_networks()
+        assert sorted(x["id"] for x in networks) == ["citybikes", "hsl"]
+        assert not self.sent
+
+    def test_list_networks__concurrent(self):
+        for provider in self.providers:
+            provider.list_networks = self.get_list_networks(provider.id, 0.2)
+        start = time.time()
+        networks = self.app.list_networks()
+        assert time.time() - start < 0.35
+        assert len(networks) == 2
+
+    def test_list_networks__limit(self):
+        networks = self.app.list_networks(limit=1)
+        assert len(networks) == 1
+        networks = self.app.list_networks(limit=1, offset=1)
+        assert len(networks) == 1
+        networks = self.app.list_networks(offset=2)
+        assert len(networks) == 0
+
+    def test_list_networks__error(self):
+        self.providers[0].list_networks = lambda *args: dict(error=True, message="")
+        networks = self.app.list_networks()
+        assert [x["id"] for x in networks] == ["hsl"]
+
+    def test_list_networks__timeout(self):
+        self.providers[0]._timeout = 0.1
+        self.providers[0].list_networks = self.get_list_networks("citybikes", 1)
+        start = time.time()
+        networks = self.app.list_networks()
+        assert time.time() - start < 0.5
+        assert [x["id"] for x in networks] == ["hsl"]
+        assert self.sent == [("list-networks-partial", ["citybik.es"])]
+
+    def test_list_stations__version(self):
+        stations = [dict(id=str(i), free_bikes=i) for i in range(5)]
+        self.app.provider.list_stations = lambda *args: stations[:]
+        changes = self.app.list_stations(version="")
+        assert changes["reset"]
+        assert changes["added"] == stations
+        version = changes["version"]
+        changes = self.app.list_stations(version=version)
+        assert not changes["reset"]
+        assert changes["version"] == version
+        assert not (changes["added"] or changes["changed"] or changes["removed"])
+        stations[0] = dict(id="0", free_bikes=100)
+        stations[1] = dict(id="5", free_bikes=5)
+        changes = self.app.list_stations(version=version)
+        assert not changes["reset"]
+        assert changes["version"] != version
+        assert changes["added"] == [stations[1]]
+        assert changes["changed"] == [stations[0]]
+        assert changes["removed"] == ["1"]
+
+    def test_list_stations__version_unknown(self):
+        self.app.provider.list_stations = lambda *args: [dict(id="1")]
+        changes = self.app.list_stations(version="xxx")
+        assert changes["reset"]
+        assert changes["added"] == [dict(id="1")]
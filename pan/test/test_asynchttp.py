@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import pan.test
+import pytest
+import sys
+import time
+
+if sys.version_info < (3, 5):
+    pytest.skip("pan.asynchttp requires Python 3.5",
+                allow_module_level=True)
+
+import pan.asynchttp
+
+from pan.test.test_http import LARGE
+from pan.test.test_http import Server
+
+
+class TestModule(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.server = Server()
+
+    def teardown_method(self, method):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_gather_json(self):
+        urls = [self.server.url + x for x in ["/plain.json", "/large.json"]]
+        assert pan.asynchttp.gather_json(urls) == [{"a": 1}, LARGE]
+
+    def test_gather_json__concurrent(self):
+        urls = [self.server.url + "/slow.json"] * 4
+        start = time.time()
+        assert pan.asynchttp.gather_json(urls) == [{"a": 1}] * 4
+        # Four requests of 0.5 seconds, all in flight at once.
+        assert time.time() - start < 1.5
+
+    def test_gather_json__error(self):
+        urls = [self.server.url + x for x in ["/plain.json", "/xxx.json"]]
+        self.assert_raises(Exception, pan.asynchttp.gather_json, urls)
+
+    def test_gather_json__return_exceptions(self):
+        urls = [self.server.url + x for x in ["/plain.json", "/xxx.json"]]
+        results = pan.asynchttp.gather_json(urls, return_exceptions=True)
+        assert results[0] == {"a": 1}
+        assert isinstance(results[1], Exception)
+
+    def test_get__compress(self):
+        url = self.server.url + "/large.json"
+        blob = pan.asynchttp.get(url, encoding="utf_8")
+        assert json.loads(blob) == LARGE
+
+    def test_get__no_compress(self):
+        url = self.server.url + "/large.json"
+        blob = pan.asynchttp.get(url, encoding="utf_8", compress=False)
+        assert json.loads(blob) == LARGE
+
+    def test_get__reuse(self):
+        url = self.server.url + "/plain.json"
+        key = pan.asynchttp.pool._get_key(url)
+        pan.asynchttp.get(url)
+        a = pan.asynchttp.pool._idle[key][-1][1]
+        pan.asynchttp.get(url)
+        b = pan.asynchttp.pool._idle[key][-1][1]
+        assert b is a
+
+    def test_get_json__chunked(self):
+        url = self.server.url + "/chunked.json"
+        assert pan.asynchttp.get_json(url) == {"a": 1}
+
+    def test_get_json__deflate(self):
+        url = self.server.url + "/deflate.json"
+        assert pan.asynchttp.get_json(url) == {"a": 1}
+
+    def test_get_json__etag(self):
+        url = self.server.url + "/etag.json"
+        a = pan.asynchttp.get_json(url)
+        b = pan.asynchttp.get_json(url)
+        assert a == {"a": 1}
+        assert b is a
+        assert len(self.server.requests) == 2
+
+    def test_get_json__non_200(self):
+        url = self.server.url + "/xxx.json"
+        self.assert_raises(Exception, pan.asynchttp.get_json, url)
+
+    def test_get_json__stalled(self):
+        url = self.server.url + "/stalled.json"
+        get_timeout = pan.asynchttp._get_timeout
+        pan.asynchttp._get_timeout = lambda url: 0.5
+        try:
+            self.assert_raises(Exception, pan.asynchttp.get_json, url)
+        finally:
+            pan.asynchttp._get_timeout = get_timeout
+
+    def test_get_json__trickle(self):
+        # Timeout applies to each read, not the whole response,
+        # which here takes longer than the timeout to arrive.
+        url = self.server.url + "/trickle.json"
+        get_timeout = pan.asynchttp._get_timeout
+        pan.asynchttp._get_timeout = lambda url: 0.5
+        try:
+            assert pan.asynchttp.get_json(url) == {"a": 1}
+        finally:
+            pan.asynchttp._get_timeout = get_timeout
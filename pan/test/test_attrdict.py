@@ -15,6 +15,7 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import copy
 import pan.test
 
 
@@ -78,3 +79,67 @@ class TestAttrDict(pan.test.TestCase):
         self.dct.update(d=dict(e=1, f=dict(g=1)))
         assert isinstance(self.dct.d, pan.AttrDict)
         assert isinstance(self.dct.d.f, pan.AttrDict)
+
+
+class TestLazyAttrDict(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.data = dict(a=1,
+                         b=[1, 2, dict(a=1)],
+                         c=dict(a=1, b=2, c=dict(a=1)))
+        self.dct = pan.LazyAttrDict(self.data)
+
+    def test___init____shared(self):
+        self.dct.d = 100
+        assert self.data["d"] == 100
+        assert pan.LazyAttrDict(self.dct)._data is self.data
+
+    def test___delattr__(self):
+        del self.dct.a
+        assert not hasattr(self.dct, "a")
+        assert not "a" in self.data
+
+    def test___eq__(self):
+        assert self.dct == self.data
+        assert self.dct == pan.LazyAttrDict(self.data)
+        assert self.dct.c != self.data
+
+    def test___getattr__(self):
+        assert self.dct.a == 1
+        assert self.dct.c.c.a == 1
+        assert self.dct.b[2].a == 1
+        assert self.dct.c == self.dct["c"]
+        self.assert_raises(AttributeError, getattr, self.dct, "d")
+
+    def test___getattr____lazy(self):
+        assert isinstance(self.dct.c, pan.LazyAttrDict)
+        assert isinstance(self.dct.b, pan.attrdict.LazyAttrList)
+        assert self.dct.c._data is self.data["c"]
+        assert self.dct.b._data is self.data["b"]
+        assert type(self.data["c"]["c"]) is dict
+
+    def test___iter__(self):
+        assert list(self.dct) == ["a", "b", "c"]
+        assert [type(x) for x in self.dct.b] == [
+            int, int, pan.LazyAttrDict]
+
+    def test___setattr__(self):
+        self.dct.d = pan.LazyAttrDict(e=1)
+        assert self.dct.d.e == 1
+        assert type(self.data["d"]) is dict
+
+    def test_copy(self):
+        dct = copy.copy(self.dct)
+        assert dct == self.dct
+        dct.a = 100
+        assert self.data["a"] == 1
+
+    def test_list(self):
+        self.dct.b.append(pan.LazyAttrDict(a=2))
+        assert self.dct.b[3].a == 2
+        assert type(self.data["b"][3]) is dict
+        assert self.dct.b[1:] == [2, dict(a=1), dict(a=2)]
+
+    def test_update(self):
+        self.dct.update(a=100)
+        assert self.data["a"] == 100
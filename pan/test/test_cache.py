@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import pan.test
+import shutil
+import tempfile
+
+
+class TestModule(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.cache_home_dir = pan.CACHE_HOME_DIR
+        pan.CACHE_HOME_DIR = tempfile.mkdtemp()
+
+    def teardown_method(self, method):
+        shutil.rmtree(pan.CACHE_HOME_DIR)
+        pan.CACHE_HOME_DIR = self.cache_home_dir
+
+    def test_get_path(self):
+        path = pan.cache.get_path("stations", "hsl", "a/b")
+        assert path == os.path.join(pan.CACHE_HOME_DIR, "stations", "hsl", "a%2Fb.json")
+
+    def test_read__bad_version(self):
+        path = pan.cache.get_path("test")
+        pan.util.write_json(dict(data=[1], utime=1, version="0.0"), path)
+        assert pan.cache.read("test") == (None, -1)
+
+    def test_read__missing(self):
+        assert pan.cache.read("test") == (None, -1)
+
+    def test_write(self):
+        pan.cache.write([1, 2, 3], "a", "b", utime=100)
+        assert pan.cache.read("a", "b") == ([1, 2, 3], 100)
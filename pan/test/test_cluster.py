@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pan.cluster
+import pan.test
+import random
+
+
+class TestClusterTree(pan.test.TestCase):
+
+    def setup_method(self, method):
+        rd = random.Random(1)
+        self.stations = [dict(empty_slots=rd.randint(0, 10),
+                              free_bikes=rd.choice([None, 1, 2]),
+                              x=rd.uniform(24, 25),
+                              y=rd.uniform(60, 61))
+                         for i in range(1000)]
+        self.numpy = pan.cluster.numpy
+
+    def teardown_method(self, method):
+        pan.cluster.numpy = self.numpy
+
+    def get_trees(self, stations):
+        # Test both the NumPy and the pure-Python path.
+        trees = []
+        if self.numpy is not None:
+            trees.append(pan.ClusterTree(stations))
+        pan.cluster.numpy = None
+        trees.append(pan.ClusterTree(stations))
+        pan.cluster.numpy = self.numpy
+        return trees
+
+    def test_list(self):
+        bbox = (23, 26, 59, 62)
+        free_bikes = sum(x["free_bikes"] or 0 for x in self.stations)
+        empty_slots = sum(x["empty_slots"] for x in self.stations)
+        for tree in self.get_trees(self.stations):
+            for zoom in range(0, 19, 3):
+                clusters = tree.list(bbox, zoom)
+                assert sum(x["count"] for x in clusters) == 1000
+                assert sum(x["free_bikes"] or 0 for x in clusters) == free_bikes
+                assert sum(x["empty_slots"] for x in clusters) == empty_slots
+                for cluster in clusters:
+                    assert 24 < cluster["x"] < 25
+                    assert 60 < cluster["y"] < 61
+
+    def test_list__bbox(self):
+        bbox = (24.2, 24.4, 60.2, 60.4)
+        for tree in self.get_trees(self.stations):
+            clusters = tree.list(bbox, 12)
+            # Cells partially inside bbox are included whole.
+            assert sum(x["count"] for x in clusters) >= len(
+                [x for x in self.stations
+                 if 24.2 < x["x"] < 24.4 and 60.2 < x["y"] < 60.4])
+            assert sum(x["count"] for x in clusters) < 1000
+
+    def test_list__bounded(self):
+        bbox = (-180, 180, -85, 85)
+        n = pan.cluster.MAX_CELLS_ACROSS + 1
+        for tree in self.get_trees(self.stations):
+            assert len(tree.list(bbox, 18)) <= n * n
+            assert len(tree.list(bbox)) <= n * n
+
+    def test_list__empty(self):
+        for tree in self.get_trees([]):
+            assert tree.list((24, 25, 60, 61), 10) == []
+
+    def test_list__equal(self):
+        bbox = (24.2, 24.8, 60.2, 60.8)
+        trees = self.get_trees(self.stations)
+        key = lambda x: x["id"]
+        for zoom in [4, 8, 12]:
+            results = [sorted(x.list(bbox, zoom), key=key) for x in trees]
+            for a, b in zip(results[0], results[-1]):
+                assert a["id"] == b["id"]
+                assert a["count"] == b["count"]
+                assert a["free_bikes"] == b["free_bikes"]
+                assert abs(a["x"] - b["x"]) < 1e-9
+
+    def test_list__missing(self):
+        stations = [dict(empty_slots=None, free_bikes=None, x=24.5, y=60.5)]
+        for tree in self.get_trees(stations):
+            clusters = tree.list((24, 25, 60, 61), 10)
+            assert len(clusters) == 1
+            assert clusters[0]["count"] == 1
+            assert clusters[0]["empty_slots"] is None
+            assert clusters[0]["free_bikes"] is None
+
+    def test_replace(self):
+        bbox = (24.2, 24.8, 60.2, 60.8)
+        stations = [dict(x, free_bikes=3) for x in self.stations]
+        stations[0]["empty_slots"] = None
+        key = lambda x: x["id"]
+        for tree in self.get_trees(self.stations):
+            pan.cluster.numpy = None
+            expected = pan.ClusterTree(stations)
+            pan.cluster.numpy = self.numpy
+            replaced = tree.replace(stations)
+            for zoom in [0, 8, 12, 18]:
+                a = sorted(replaced.list(bbox, zoom), key=key)
+                b = sorted(expected.list(bbox, zoom), key=key)
+                assert [x["id"] for x in a] == [x["id"] for x in b]
+                assert [x["free_bikes"] for x in a] == [x["free_bikes"] for x in b]
+                assert [x["empty_slots"] for x in a] == [x["empty_slots"] for x in b]
+            # The original tree is left as it was.
+            assert sum(x["free_bikes"] or 0 for x in tree.list(bbox, 0)) < 3000
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pan.test
+import random
+
+
+class TestGrid(pan.test.TestCase):
+
+    def setup_method(self, method):
+        rd = random.Random(1)
+        self.items = [dict(x=rd.uniform(24, 25), y=rd.uniform(60, 61))
+                      for i in range(1000)]
+        self.grid = pan.Grid(self.items)
+
+    def brute_force(self, xmin, xmax, ymin, ymax):
+        return [x for x in self.items
+                if xmin < x["x"] < xmax and ymin < x["y"] < ymax]
+
+    def test___iter__(self):
+        assert len(list(self.grid)) == len(self.items)
+
+    def test___len__(self):
+        assert len(self.grid) == len(self.items)
+
+    def test___len____empty(self):
+        assert len(pan.Grid([])) == 0
+
+    def test_query(self):
+        for bbox in ([24.1, 24.3, 60.5, 60.6],
+                     [24.9, 26.0, 59.0, 60.1],
+                     [23.0, 26.0, 59.0, 62.0]):
+            found = self.grid.query(*bbox)
+            expected = self.brute_force(*bbox)
+            assert len(found) == len(expected)
+            assert sorted(map(id, found)) == sorted(map(id, expected))
+
+    def test_query__empty(self):
+        assert pan.Grid([]).query(-180, 180, -90, 90) == []
+
+    def test_query__outside(self):
+        assert self.grid.query(10, 11, 60, 61) == []
+        assert self.grid.query(24, 25, 10, 11) == []
+
+    def test_query__outlier(self):
+        items = self.items + [dict(x=0, y=0)]
+        grid = pan.Grid(items)
+        bbox = [24.1, 24.3, 60.5, 60.6]
+        assert len(grid.query_candidates(*bbox)) < len(self.items) / 10
+        assert len(grid.query(*bbox)) == len(self.brute_force(*bbox))
+        assert grid.query(-1, 1, -1, 1) == [dict(x=0, y=0)]
+        assert len(grid.query(-1, 26, -1, 61)) == len(items)
+
+    def test_query__single(self):
+        grid = pan.Grid([dict(x=24.5, y=60.5)])
+        assert len(grid.query(24, 25, 60, 61)) == 1
+        assert len(grid.query(24, 24.4, 60, 61)) == 0
+
+    def test_query_candidates(self):
+        bbox = [24.1, 24.3, 60.5, 60.6]
+        candidates = self.grid.query_candidates(*bbox)
+        assert len(self.brute_force(*bbox)) <= len(candidates) < len(self.items)
+
+    def test_query_slices(self):
+        bbox = [24.1, 24.3, 60.5, 60.6]
+        slices = self.grid.query_slices(*bbox)
+        items = [self.grid.items[i] for a, b in slices for i in range(a, b)]
+        assert items == self.grid.query_candidates(*bbox)
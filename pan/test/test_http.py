@@ -15,9 +15,100 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import http.server
+import json
+import pan.http
+import pan.jsonlib
 import pan.test
+import socketserver
 import threading
 import time
+import zlib
+
+# Large enough to be read in several chunks.
+LARGE = [dict(id=i, name="Station {:d}".format(i)) for i in range(10000)]
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path == "/etag.json":
+            if self.headers.get("If-None-Match") == '"1"':
+                return self.send(304, b"")
+            return self.send(200, b'{"a": 1}', ETag='"1"')
+        if self.path == "/last-modified.json":
+            modified = "Mon, 01 Jan 2018 00:00:00 GMT"
+            if self.headers.get("If-Modified-Since") == modified:
+                return self.send(304, b"")
+            return self.send(200, b'{"a": 1}', **{"Last-Modified": modified})
+        if self.path == "/plain.json":
+            return self.send(200, b'{"a": 1}')
+        if self.path == "/slow.json":
+            time.sleep(0.5)
+            return self.send(200, b'{"a": 1}')
+        if self.path == "/chunked.json":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for chunk in [b'{"a": ', b'1}']:
+                size = "{:x}\r\n".format(len(chunk)).encode("ascii")
+                self.wfile.write(size + chunk + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+            return
+        if self.path in ("/stalled.json", "/trickle.json"):
+            # Send body in pieces with pauses in between,
+            # a long one if stalled, short ones if trickling.
+            body = b'{"a": 1}'
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            for i in range(4):
+                time.sleep(1 if self.path == "/stalled.json" and i == 2 else 0.2)
+                self.wfile.write(body[2*i:2*i+2])
+                self.wfile.flush()
+            return
+        if self.path == "/large.json":
+            body = json.dumps(LARGE).encode("utf_8")
+            accept = self.headers.get("Accept-Encoding", "")
+            if "gzip" not in accept:
+                return self.send(200, body)
+            compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+            body = compressor.compress(body) + compressor.flush()
+            return self.send(200, body, **{"Content-Encoding": "gzip"})
+        if self.path == "/deflate.json":
+            body = zlib.compress(b'{"a": 1}')
+            return self.send(200, body, **{"Content-Encoding": "deflate"})
+        if self.path == "/raw-deflate.json":
+            compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+            body = compressor.compress(b'{"a": 1}') + compressor.flush()
+            return self.send(200, body, **{"Content-Encoding": "deflate"})
+        return self.send(404, b"")
+
+    def log_message(self, *args):
+        pass
+
+    def send(self, status, body, **headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self):
+        http.server.HTTPServer.__init__(self, ("127.0.0.1", 0), Handler)
+        self.requests = []
+        self.url = "http://127.0.0.1:{:d}".format(self.server_address[1])
+        threading.Thread(target=self.serve_forever, daemon=True).start()
 
 
 class TestConnectionPool(pan.test.TestCase):
@@ -54,6 +145,73 @@ class TestConnectionPool(pan.test.TestCase):
         self.pool.terminate()
         time.sleep(3)
 
+    def test_get__idle_timeout(self):
+        pool = pan.http.ConnectionPool(1, idle_timeout=0)
+        connection1 = pool.get(self.http_url)
+        pool.put(self.http_url, connection1)
+        time.sleep(0.01)
+        connection2 = pool.get(self.http_url)
+        assert connection2 is not connection1
+        pool.terminate()
+
+    def test_get__reuse(self):
+        connection1 = self.pool.get(self.http_url)
+        self.pool.put(self.http_url, connection1)
+        connection2 = self.pool.get(self.http_url)
+        assert connection2 is connection1
+
+    def test_get__terminate_wakeup(self):
+        self.pool.get(self.http_url)
+        self.pool.get(self.http_url)
+        errors = []
+        def get():
+            try:
+                self.pool.get(self.http_url)
+            except Exception as error:
+                errors.append(error)
+        thread = threading.Thread(target=get)
+        thread.start()
+        time.sleep(0.1)
+        start = time.time()
+        self.pool.terminate()
+        thread.join(1)
+        assert time.time() - start < 0.5
+        assert len(errors) == 1
+
+    def test_get__wait(self):
+        connection = self.pool.get(self.http_url)
+        self.pool.get(self.http_url)
+        threading.Timer(0.1, self.pool.put, (self.http_url, connection)).start()
+        assert self.pool.get(self.http_url) is connection
+        stats = self.pool.get_stats()
+        assert stats["checkouts"] == 3
+        assert stats["waits"] == 1
+        assert 0.05 < stats["wait_time"] < 1
+
+    def test_get__wait_hosts(self):
+        pool = pan.http.ConnectionPool(1)
+        connection = pool.get(self.http_url)
+        pool.get(self.https_url)
+        found = []
+        # Queue a waiter for the other host first, which
+        # must not take the wakeup meant for the second.
+        get = lambda url: found.append(pool.get(url))
+        threading.Thread(target=get, args=(self.https_url,), daemon=True).start()
+        time.sleep(0.1)
+        thread = threading.Thread(target=get, args=(self.http_url,), daemon=True)
+        thread.start()
+        time.sleep(0.1)
+        pool.put(self.http_url, connection)
+        thread.join(1)
+        assert found == [connection]
+        pool.terminate()
+
+    def test_get_stats(self):
+        self.pool.get(self.http_url)
+        stats = self.pool.get_stats()
+        assert stats["checkouts"] == 1
+        assert stats["waits"] == 0
+
     def test_is_alive(self):
         assert self.pool.is_alive()
         self.pool.terminate()
@@ -74,6 +232,11 @@ class TestConnectionPool(pan.test.TestCase):
         connection = self.pool.get(self.http_url)
         assert connection is not None
 
+    def test_set_limit(self):
+        self.pool.set_limit(self.http_url, 3)
+        connections = [self.pool.get(self.http_url) for i in range(3)]
+        assert len(set(map(id, connections))) == 3
+
     def test_terminate(self):
         self.pool.terminate()
         assert not self.pool.is_alive()
@@ -101,3 +264,95 @@ class TestModule(pan.test.TestCase):
     def test_get_json__error(self):
         url = "https://otsaloma.io/pub/test.xml"
         self.assert_raises(Exception, pan.http.get_json, url)
+
+
+class TestModuleLocal(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.ijson = pan.jsonlib.ijson
+        self.server = Server()
+
+    def teardown_method(self, method):
+        pan.jsonlib.ijson = self.ijson
+        self.server.shutdown()
+        self.server.server_close()
+
+    def get_ijsons(self):
+        # Test both with ijson and the fallback.
+        if self.ijson is None: return [None]
+        return [self.ijson, None]
+
+    def test_get__compress(self):
+        url = self.server.url + "/large.json"
+        blob = pan.http.get(url, encoding="utf_8")
+        assert json.loads(blob) == LARGE
+
+    def test_get__no_compress(self):
+        url = self.server.url + "/large.json"
+        blob = pan.http.get(url, encoding="utf_8", compress=False)
+        assert json.loads(blob) == LARGE
+
+    def test_get_json__deflate(self):
+        url = self.server.url + "/deflate.json"
+        assert pan.http.get_json(url) == {"a": 1}
+
+    def test_get_json__deflate_raw(self):
+        url = self.server.url + "/raw-deflate.json"
+        assert pan.http.get_json(url) == {"a": 1}
+
+    def test_get_json__etag(self):
+        url = self.server.url + "/etag.json"
+        a = pan.http.get_json(url)
+        b = pan.http.get_json(url)
+        assert a == {"a": 1}
+        assert b is a
+        assert len(self.server.requests) == 2
+
+    def test_get_json__last_modified(self):
+        url = self.server.url + "/last-modified.json"
+        a = pan.http.get_json(url)
+        b = pan.http.get_json(url)
+        assert a == {"a": 1}
+        assert b is a
+
+    def test_get_json__no_validators(self):
+        url = self.server.url + "/plain.json"
+        a = pan.http.get_json(url)
+        b = pan.http.get_json(url)
+        assert a == b == {"a": 1}
+        assert b is not a
+
+    def test_get_json__non_200(self):
+        url = self.server.url + "/xxx.json"
+        self.assert_raises(Exception, pan.http.get_json, url)
+
+    def test_iter_json(self):
+        url = self.server.url + "/large.json"
+        for ijson in self.get_ijsons():
+            pan.jsonlib.ijson = ijson
+            assert list(pan.http.iter_json(url)) == LARGE
+
+    def test_iter_json__no_compress(self):
+        url = self.server.url + "/large.json"
+        for ijson in self.get_ijsons():
+            pan.jsonlib.ijson = ijson
+            assert list(pan.http.iter_json(url, compress=False)) == LARGE
+
+    def test_iter_json__non_200(self):
+        url = self.server.url + "/xxx.json"
+        self.assert_raises(Exception, list, pan.http.iter_json(url))
+
+    def test_iter_json__path(self):
+        url = self.server.url + "/plain.json"
+        for ijson in self.get_ijsons():
+            pan.jsonlib.ijson = ijson
+            assert list(pan.http.iter_json(url, "a")) == [1]
+            assert list(pan.http.iter_json(url, "b")) == []
+
+    def test_iter_json__stop(self):
+        url = self.server.url + "/large.json"
+        items = pan.http.iter_json(url)
+        assert next(items) == LARGE[0]
+        items.close()
+        assert list(pan.http.iter_json(url)) == LARGE
+        assert len(self.server.requests) == 2
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import hashlib
+import operator
+import pan.test
+
+
+class TestIdentityTable(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.table = pan.IdentityTable()
+        self.table.update(self.get_stations())
+
+    def get_stations(self):
+        return [dict(free_bikes=i, id=str(i), name="Station {:d}".format(i),
+                     x=24.9, y=60.2) for i in range(10)]
+
+    def test___init__(self):
+        table = pan.IdentityTable(map(dict, self.table.stations))
+        assert table.stations == self.table.stations
+        assert not table.update(self.get_stations())
+
+    def test___len__(self):
+        assert len(self.table) == 10
+
+    def test_update(self):
+        station = self.table.stations[0]
+        assert station["key"] == hashlib.md5(b"0").hexdigest()
+        assert dict(station) == dict(self.get_stations()[0], key=station["key"])
+
+    def test_update__added(self):
+        stations = self.get_stations()
+        stations.append(dict(free_bikes=1, id="10", name="", x=0, y=0))
+        assert self.table.update(stations) == ["10"]
+        assert len(self.table) == 11
+        assert self.table.moved
+
+    def test_update__changed(self):
+        old = self.table.stations[1]
+        stations = self.get_stations()
+        stations[1]["free_bikes"] = 0
+        assert self.table.update(stations) == ["1"]
+        new = self.table.stations[1]
+        assert new["free_bikes"] == 0
+        assert old["free_bikes"] == 1
+        assert new["key"] == old["key"]
+        assert new["name"] is old["name"]
+        assert not self.table.moved
+
+    def test_update__moved(self):
+        stations = self.get_stations()
+        stations[1]["x"] = 25.0
+        assert self.table.update(stations) == ["1"]
+        assert self.table.moved
+
+    def test_update__read_only(self):
+        self.assert_raises(TypeError,
+                           operator.setitem,
+                           self.table.stations[0], "free_bikes", 0)
+
+    def test_update__removed(self):
+        assert self.table.update(self.get_stations()[1:]) == ["0"]
+        assert len(self.table) == 9
+        assert self.table.moved
+
+    def test_update__unchanged(self):
+        old = self.table.stations
+        assert self.table.update(self.get_stations()) == []
+        assert all(a is b for a, b in zip(old, self.table.stations))
+        assert not self.table.moved
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import importlib
+import os
+import pan.imports
+import pan.test
+import shutil
+import sys
+import tempfile
+
+
+class TestImportProfiler(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.directory = tempfile.mkdtemp()
+        for name, code in [("pan_test_a", "import pan_test_b\n"),
+                           ("pan_test_b", "x = 1\n")]:
+            with open(os.path.join(self.directory, name + ".py"), "w") as f:
+                f.write(code)
+        sys.path.insert(0, self.directory)
+        self.profiler = pan.imports.ImportProfiler()
+        self.profiler.install()
+
+    def teardown_method(self, method):
+        self.profiler.uninstall()
+        sys.path.remove(self.directory)
+        sys.modules.pop("pan_test_a", None)
+        sys.modules.pop("pan_test_b", None)
+        shutil.rmtree(self.directory)
+
+    def test_get_times(self):
+        importlib.import_module("pan_test_a")
+        times = {x["name"]: x for x in self.profiler.get_times()}
+        a, b = times["pan_test_a"], times["pan_test_b"]
+        assert a["cumulative"] >= b["cumulative"]
+        assert a["cumulative"] >= a["self"]
+        assert abs(a["cumulative"] - a["self"] - b["cumulative"]) < 1e-6
+
+    def test_get_times__limit(self):
+        importlib.import_module("pan_test_a")
+        assert len(self.profiler.get_times(1)) == 1
+
+    def test_uninstall(self):
+        self.profiler.uninstall()
+        importlib.import_module("pan_test_a")
+        assert not self.profiler.get_times()
+        assert sys.modules["pan_test_b"].x == 1
+
+
+class TestModule(pan.test.TestCase):
+
+    def test_lazy_import(self):
+        sys.modules.pop("colorsys", None)
+        module = pan.imports.lazy_import("colorsys")
+        assert "colorsys" not in sys.modules
+        assert module.rgb_to_hsv(0, 0, 0) == (0, 0, 0)
+        assert "colorsys" in sys.modules
+
+    def test_lazy_import__imported(self):
+        assert pan.imports.lazy_import("os") is os
+
+    def test_lazy_import__missing(self):
+        assert pan.imports.lazy_import("xxx_missing") is None
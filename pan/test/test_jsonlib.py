@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import json
+import pan.jsonlib
+import pan.test
+
+
+class TestModule(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.backend = pan.jsonlib.backend
+        self.ijson = pan.jsonlib.ijson
+        self.data = dict(name="Kaivopuisto", free_bikes=3, x=24.95, y=60.16)
+
+    def teardown_method(self, method):
+        pan.jsonlib.set_backend(self.backend)
+        pan.jsonlib.ijson = self.ijson
+
+    def get_ijsons(self):
+        # Test both with ijson and the fallback.
+        if self.ijson is None: return [None]
+        return [self.ijson, None]
+
+    def test_get_backends(self):
+        backends = pan.jsonlib.get_backends()
+        assert backends[-1] == "json"
+        assert pan.jsonlib.backend == backends[0]
+
+    def test_iter_items(self):
+        data = dict(network=dict(id="x", stations=[self.data] * 100))
+        blob = json.dumps(data).encode("utf_8")
+        for ijson in self.get_ijsons():
+            pan.jsonlib.ijson = ijson
+            for size in [1, 10, 100, len(blob)]:
+                chunks = [blob[i:i+size] for i in range(0, len(blob), size)]
+                items = pan.jsonlib.iter_items(chunks, "network.stations.item")
+                assert list(items) == [self.data] * 100
+
+    def test_iter_items__invalid(self):
+        for ijson in self.get_ijsons():
+            pan.jsonlib.ijson = ijson
+            for blob in [b'[1, 2', b'[1, 2}', b'[1, 2] 3']:
+                items = pan.jsonlib.iter_items([blob], "item")
+                self.assert_raises(ValueError, list, items)
+
+    def test_iter_items__path(self):
+        blob = b'{"a": [1, {"b": 2}], "item": 3, "c": {"item": [4]}}'
+        for ijson in self.get_ijsons():
+            pan.jsonlib.ijson = ijson
+            assert list(pan.jsonlib.iter_items([blob], "a.item")) == [1, {"b": 2}]
+            assert list(pan.jsonlib.iter_items([blob], "a.item.b")) == [2]
+            assert list(pan.jsonlib.iter_items([blob], "item")) == [3]
+            assert list(pan.jsonlib.iter_items([blob], "c.item")) == [[4]]
+            assert list(pan.jsonlib.iter_items([blob], "x.item")) == []
+
+    def test_iter_items__split(self):
+        blob = b'{"a": [24.941, 2.5e3, -1E-2, 10, true, null, "x"], "b": 1.5}'
+        expected = [24.941, 2.5e3, -1E-2, 10, True, None, "x"]
+        for ijson in self.get_ijsons():
+            pan.jsonlib.ijson = ijson
+            for i in range(1, len(blob)):
+                chunks = [blob[:i], blob[i:]]
+                assert list(pan.jsonlib.iter_items(chunks, "a.item")) == expected
+                assert list(pan.jsonlib.iter_items(chunks, "b")) == [1.5]
+
+    def test_loads(self):
+        for backend in pan.jsonlib.get_backends():
+            pan.jsonlib.set_backend(backend)
+            text = '{"name": "Kaivopuisto", "free_bikes": 3, "x": 24.95, "y": 60.16}'
+            assert pan.jsonlib.loads(text) == self.data
+            assert pan.jsonlib.loads(text.encode("utf_8")) == self.data
+
+    def test_loads__encoding(self):
+        for backend in pan.jsonlib.get_backends():
+            pan.jsonlib.set_backend(backend)
+            blob = '["Töölöntori"]'.encode("latin_1")
+            assert pan.jsonlib.loads(blob, "latin_1") == ["Töölöntori"]
+
+    def test_loads__invalid(self):
+        for backend in pan.jsonlib.get_backends():
+            pan.jsonlib.set_backend(backend)
+            self.assert_raises(ValueError, pan.jsonlib.loads, b'{"a": ')
+            self.assert_raises(ValueError, pan.jsonlib.loads, '{"a": ')
+
+    def test_loads__invalid_utf_8(self):
+        for backend in pan.jsonlib.get_backends():
+            pan.jsonlib.set_backend(backend)
+            assert pan.jsonlib.loads(b'["T\xf6\xf6l\xf6"]') == ["T\ufffd\ufffdl\ufffd"]
+
+    def test_loads__text(self):
+        # Simulate the standard library json before Python 3.6.
+        pan.jsonlib.set_backend("json")
+        pan.jsonlib.accepts_bytes = False
+        def loads(data):
+            if isinstance(data, bytes): raise TypeError
+            return json.loads(data)
+        pan.jsonlib._loads = loads
+        blob = '["Töölöntori"]'.encode("utf_8")
+        assert pan.jsonlib.loads(blob) == ["Töölöntori"]
+        assert pan.jsonlib.loads(blob, "latin_1") == ["TÃ¶Ã¶lÃ¶ntori"]
+
+    def test_set_backend(self):
+        pan.jsonlib.set_backend("json")
+        assert pan.jsonlib.backend == "json"
+        pan.jsonlib.set_backend()
+        assert pan.jsonlib.backend == pan.jsonlib.get_backends()[0]
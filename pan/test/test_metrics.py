@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2014 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pan.metrics
+import pan.test
+
+
+class TestHistogram(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.histogram = pan.metrics.Histogram()
+
+    def test_get_percentile(self):
+        for value in range(1, 101):
+            self.histogram.observe(value)
+        assert self.histogram.get_percentile(50) == 50
+        assert self.histogram.get_percentile(95) == 95
+        assert self.histogram.get_percentile(99) == 99
+        assert self.histogram.get_percentile(100) == 100
+
+    def test_get_percentile__empty(self):
+        assert self.histogram.get_percentile(50) is None
+
+    def test_get_summary(self):
+        for value in [1, 2, 3, 10]:
+            self.histogram.observe(value)
+        summary = self.histogram.get_summary()
+        assert summary["count"] == 4
+        assert summary["max"] == 10
+        assert summary["mean"] == 4
+        assert summary["p50"] == 2
+
+    def test_observe__size(self):
+        histogram = pan.metrics.Histogram(size=10)
+        for value in range(100):
+            histogram.observe(value)
+        assert histogram.count == 100
+        assert histogram.get_percentile(0) == 90
+
+
+class TestRegistry(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.registry = pan.metrics.Registry()
+
+    def test_count(self):
+        self.registry.count("api.list_stations.calls")
+        self.registry.count("api.list_stations.calls", 2)
+        stats = self.registry.get_stats()
+        assert stats["api"]["list_stations"]["calls"] == 3
+
+    def test_get_stats__hit_ratio(self):
+        self.registry.count("cache.hits", 3)
+        self.registry.count("cache.misses", 1)
+        assert self.registry.get_stats()["cache"]["hit_ratio"] == 0.75
+
+    def test_observe(self):
+        self.registry.observe("http.latency", 1)
+        self.registry.observe("http.latency", 3)
+        stats = self.registry.get_stats()
+        assert stats["http"]["latency"]["count"] == 2
+        assert stats["http"]["latency"]["mean"] == 2
+
+    def test_reset(self):
+        self.registry.count("http.requests")
+        self.registry.reset()
+        assert self.registry.get_stats() == {}
+
+    def test_timed(self):
+        with self.registry.timed("http.parse_time"):
+            pass
+        stats = self.registry.get_stats()
+        assert stats["http"]["parse_time"]["count"] == 1
+        assert stats["http"]["parse_time"]["max"] >= 0
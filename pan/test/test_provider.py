@@ -16,6 +16,273 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import pan.test
+import shutil
+import tempfile
+import threading
+import time
+
+
+class FakeProvider:
+
+    def __init__(self, delay=0):
+        self.calls = 0
+        self.delay = delay
+        self.network_calls = 0
+
+    def list_networks(self):
+        self.network_calls += 1
+        time.sleep(self.delay)
+        return [dict(city="Lisbon", country="PT", id="lisbon",
+                     name="Lisbon", x=-9.14, y=38.72),
+                dict(city="Helsinki", country="FI", id="helsinki",
+                     name="Helsinki", x=24.94, y=60.17)]
+
+    def list_stations(self, network):
+        self.calls += 1
+        time.sleep(self.delay)
+        return [dict(empty_slots=i % 7,
+                     free_bikes=i % 5,
+                     id="{:d}".format(i),
+                     name="Station {:d}".format(i),
+                     x=24.80 + (i % 20) * 0.01,
+                     y=60.10 + (i // 20) * 0.01)
+                for i in range(400)]
+
+
+class TestFakeProvider(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.cache_home_dir = pan.CACHE_HOME_DIR
+        pan.CACHE_HOME_DIR = tempfile.mkdtemp()
+        self.provider = pan.Provider("citybikes")
+        self.backup = self.provider.__dict__.copy()
+        self.provider._provider = FakeProvider()
+        self.provider._networks = []
+        self.provider._stations = {}
+        self.provider._stations_utime = {}
+        self.provider._tables = {}
+        self.provider._ttl = None
+        self.provider._viewports = {}
+        self.network = "helsinki"
+        self.threshold = pan.store.INCREMENTAL_THRESHOLD
+        self.bbox = [24.85, 24.95, 60.15, 60.25]
+
+    def teardown_method(self, method):
+        self.provider.__dict__.clear()
+        self.provider.__dict__.update(self.backup)
+        pan.conf.stale_while_revalidate = True
+        pan.store.INCREMENTAL_THRESHOLD = self.threshold
+        shutil.rmtree(pan.CACHE_HOME_DIR)
+        pan.CACHE_HOME_DIR = self.cache_home_dir
+
+    def call_concurrently(self, function, *args, n=8):
+        results = [None] * n
+        barrier = threading.Barrier(n)
+        def call(i):
+            barrier.wait()
+            results[i] = function(*args)
+        threads = [threading.Thread(target=call, args=(i,)) for i in range(n)]
+        for thread in threads: thread.start()
+        for thread in threads: thread.join()
+        return results
+
+    def test_get_center(self):
+        self.provider.list_stations(self.network)
+        center = self.provider.get_center(self.network)
+        assert round(center["x"], 3) == 24.895
+        assert round(center["y"], 3) == 60.195
+
+    def test_get_total_stations(self):
+        self.provider.list_stations(self.network)
+        assert self.provider.get_total_stations(self.network) == 400
+        assert self.provider.get_total_stations(self.network, self.bbox) == 81
+
+    def test_list_clusters(self):
+        clusters = self.provider.list_clusters(self.network, self.bbox, 10)
+        assert sum(x["count"] for x in clusters) >= 81
+        clusters = self.provider.list_clusters(self.network)
+        assert sum(x["count"] for x in clusters) == 400
+
+    def test_list_networks(self):
+        networks = self.provider.list_networks(x=24.94, y=60.17)
+        assert [x["id"] for x in networks] == ["helsinki", "lisbon"]
+        assert networks[0]["provider_id"] == "citybikes"
+
+    def test_list_networks__cache(self):
+        self.provider.list_networks()
+        self.provider._networks = []
+        self.provider._provider.list_networks = lambda: 1/0
+        networks = self.provider.list_networks()
+        assert len(networks) == 2
+
+    def test_list_networks__concurrent(self):
+        self.provider._provider = FakeProvider(delay=0.2)
+        results = self.call_concurrently(self.provider.list_networks)
+        assert self.provider._provider.network_calls == 1
+        assert all(len(x) == 2 for x in results)
+
+    def test_list_networks__copy(self):
+        networks = self.provider.list_networks()
+        networks[0]["id"] = "xxx"
+        networks = self.provider.list_networks()
+        assert "xxx" not in [x["id"] for x in networks]
+
+    def test_list_stations(self):
+        stations = self.provider.list_stations(self.network)
+        assert len(stations) == pan.conf.max_stations
+        keys = [x["key"] for x in stations]
+        assert keys == sorted(keys)
+
+    def test_list_stations__bbox(self):
+        bbox = [24.88, 24.92, 60.18, 60.22]
+        stations = self.provider.list_stations(self.network, bbox)
+        # 3x3 stations inside, 5x5 stations with the 20 % buffer.
+        assert len(stations) == 25
+
+    def test_list_stations__cache(self):
+        pan.conf.stale_while_revalidate = False
+        self.provider.list_stations(self.network)
+        self.provider.write_cache()
+        self.provider._stations = {}
+        self.provider._stations_utime = {}
+        stations = self.provider.list_stations(self.network)
+        assert len(stations) == pan.conf.max_stations
+        assert self.provider._provider.calls == 1
+
+    def test_list_stations__cache_stale(self):
+        pan.conf.stale_while_revalidate = False
+        self.provider.list_stations(self.network)
+        self.provider._stations_utime[self.network] -= 3600
+        self.provider.write_cache()
+        self.provider._stations = {}
+        self.provider._stations_utime = {}
+        self.provider.list_stations(self.network)
+        assert self.provider._provider.calls == 2
+
+    def test_list_stations__concurrent(self):
+        self.provider._provider = FakeProvider(delay=0.2)
+        results = self.call_concurrently(self.provider.list_stations, self.network)
+        assert self.provider._provider.calls == 1
+        assert all(len(x) == pan.conf.max_stations for x in results)
+
+    def test_list_stations__concurrent_error(self):
+        self.provider._provider = FakeProvider(delay=0.2)
+        list_stations = self.provider._provider.list_stations
+        self.provider._provider.list_stations = lambda x: list_stations(x)[1/0]
+        results = self.call_concurrently(self.provider.list_stations, self.network)
+        assert self.provider._provider.calls == 1
+        assert all(x == [] for x in results)
+        assert not self.provider._flights
+
+    def test_list_stations__concurrent_stale(self):
+        pan.conf.stale_while_revalidate = False
+        self.provider._provider = FakeProvider(delay=0.2)
+        self.provider.list_stations(self.network)
+        for i in range(3):
+            # One download per expiry.
+            self.provider._stations_utime[self.network] -= 3600
+            self.call_concurrently(self.provider.list_stations, self.network)
+            assert self.provider._provider.calls == i + 2
+
+    def test_list_stations__copy(self):
+        stations = self.provider.list_stations(self.network)
+        stations[0]["free_bikes"] = 1000
+        stations = self.provider.list_stations(self.network)
+        assert 1000 not in [x["free_bikes"] for x in stations]
+
+    def test_list_stations__fresh(self):
+        self.provider.list_stations(self.network)
+        self.provider.list_stations(self.network)
+        assert self.provider._provider.calls == 1
+
+    def test_list_stations__pan(self):
+        pan.store.INCREMENTAL_THRESHOLD = 0
+        for x in [24.80, 24.82, 24.85, 24.84, 24.90]:
+            bbox = [x, x + 0.1, 60.15, 60.25]
+            stations = self.provider.list_stations(self.network, bbox)
+            self.provider._viewports.clear()
+            assert stations == self.provider.list_stations(self.network, bbox)
+
+    def test_list_stations__per_network(self):
+        self.provider.list_stations(self.network)
+        self.provider._stations_utime[self.network] -= 3600
+        self.provider.list_stations("lisbon")
+        assert not self.provider.is_stale("lisbon")
+        assert self.provider.is_stale(self.network)
+
+    def test_list_stations__stale(self):
+        pan.conf.stale_while_revalidate = False
+        self.provider.list_stations(self.network)
+        self.provider._stations_utime[self.network] -= 3600
+        self.provider.list_stations(self.network)
+        assert self.provider._provider.calls == 2
+        assert not self.provider.is_stale(self.network)
+
+    def test_list_stations__stale_while_revalidate(self):
+        pan.conf.stale_while_revalidate = True
+        self.provider.list_stations(self.network)
+        self.provider._stations_utime[self.network] -= 3600
+        stations = self.provider.list_stations(self.network)
+        assert len(stations) == pan.conf.max_stations
+        for i in range(100):
+            if not self.provider._flights: break
+            time.sleep(0.01)
+        assert self.provider._provider.calls == 2
+        assert not self.provider.is_stale(self.network)
+
+    def test_update_stations(self):
+        assert len(self.provider.update_stations(self.network)) == 400
+        assert self.provider.update_stations(self.network) == []
+        self.provider._provider.list_stations = lambda network: [
+            dict(empty_slots=0, free_bikes=1, id="1", name="1", x=24.9, y=60.2)]
+        assert self.provider.update_stations(self.network)
+        assert self.provider.get_total_stations(self.network) == 1
+
+    def test_update_stations__unchanged(self):
+        self.provider.update_stations(self.network)
+        store = self.provider._stations[self.network]
+        assert not self.provider.update_stations(self.network)
+        assert self.provider._stations[self.network] is store
+        stations = FakeProvider().list_stations(self.network)
+        stations[0]["free_bikes"] += 1
+        self.provider._provider.list_stations = lambda network: stations
+        assert self.provider.update_stations(self.network) == ["0"]
+        assert self.provider._stations[self.network] is not store
+        # Only occupancy changed, the index is kept.
+        assert self.provider._stations[self.network]._grid._offsets is store._grid._offsets
+        stations = FakeProvider().list_stations(self.network)
+        stations[0]["x"] += 0.001
+        self.provider._provider.list_stations = lambda network: stations
+        assert self.provider.update_stations(self.network) == ["0"]
+        assert self.provider._stations[self.network]._grid._offsets is not store._grid._offsets
+
+    def test_query_viewport(self):
+        result = self.provider.query_viewport(self.network, self.bbox)
+        assert result["stations"] == self.provider.list_stations(self.network, self.bbox)
+        assert result["visible"] == len(result["stations"])
+        assert result["total"] == self.provider.get_total_stations(self.network, self.bbox)
+        assert result["center"] == self.provider.get_center(self.network)
+
+    def test_query_viewport__clusters(self):
+        fields = ["clusters", "stations", "total"]
+        result = self.provider.query_viewport(self.network, None, fields, 10)
+        assert sum(x["count"] for x in result["clusters"]) == 400
+        assert result["stations"] == []
+        assert result["total"] == 400
+        bbox = [24.88, 24.92, 60.18, 60.22]
+        result = self.provider.query_viewport(self.network, bbox, fields, 10)
+        assert result["clusters"] == []
+        assert len(result["stations"]) >= result["total"]
+
+    def test_query_viewport__fields(self):
+        result = self.provider.query_viewport(self.network, self.bbox, ["total"])
+        assert list(result) == ["total"]
+        assert result["total"] == 81
+
+    def test_ttl(self):
+        assert self.provider.ttl == pan.conf.ttl
+        self.provider._ttl = 300
+        assert self.provider.ttl == 300
 
 
 class TestProvider(pan.test.TestCase):
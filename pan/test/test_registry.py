@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import importlib.util
+import os
+import pan.test
+import shutil
+import sys
+import tempfile
+
+
+class TestLazyModule(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "test.py")
+        with open(self.path, "w") as f:
+            f.write("imported = True\ndef f(): return 1\n")
+        self.module = pan.registry.LazyModule("pan.providers.test", self.path)
+
+    def teardown_method(self, method):
+        shutil.rmtree(self.directory)
+
+    def test___getattr__(self):
+        assert self.module._module is None
+        assert self.module.f() == 1
+        assert self.module.imported
+
+    def test___getattr____missing(self):
+        self.assert_raises(AttributeError, getattr, self.module, "g")
+
+    def test_load(self):
+        module = self.module.load()
+        assert module is self.module.load()
+        assert module.__name__ == "pan.providers.test"
+        assert "pan.providers.test" not in sys.modules
+
+    def test_load__no_module_from_spec(self):
+        # Python 3.4 doesn't have importlib.util.module_from_spec.
+        module_from_spec = importlib.util.module_from_spec
+        del importlib.util.module_from_spec
+        try:
+            module = self.module.load()
+        finally:
+            importlib.util.module_from_spec = module_from_spec
+        assert module.__name__ == "pan.providers.test"
+        assert module.__file__ == self.path
+        assert module.f() == 1
+
+
+class TestProviderRegistry(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.data_home_dir = pan.DATA_HOME_DIR
+        pan.DATA_HOME_DIR = tempfile.mkdtemp()
+        self.directory = os.path.join(pan.DATA_HOME_DIR, "providers")
+        os.makedirs(self.directory)
+        self.registry = pan.registry.ProviderRegistry()
+        self.read_json = pan.util.read_json
+        self.reads = []
+        def read_json(path):
+            self.reads.append(path)
+            return self.read_json(path)
+        pan.util.read_json = read_json
+
+    def teardown_method(self, method):
+        pan.util.read_json = self.read_json
+        shutil.rmtree(pan.DATA_HOME_DIR)
+        pan.DATA_HOME_DIR = self.data_home_dir
+
+    def write(self, pid, name, mtime=None):
+        path = os.path.join(self.directory, "{}.json".format(pid))
+        pan.util.write_json(dict(name=name), path)
+        if mtime is not None:
+            os.utime(path, (mtime, mtime))
+            os.utime(self.directory, (mtime, mtime))
+
+    def test_get(self):
+        path, attributes = self.registry.get("hsl")
+        assert path.endswith("hsl.json")
+        assert attributes["name"]
+
+    def test_get__local(self):
+        self.write("hsl", "Local")
+        path, attributes = self.registry.get("hsl")
+        assert path.startswith(pan.DATA_HOME_DIR)
+        assert attributes["name"] == "Local"
+
+    def test_get__missing(self):
+        self.assert_raises(ValueError, self.registry.get, "xxx")
+
+    def test_list(self):
+        pids = [x["pid"] for x in self.registry.list()]
+        assert "citybikes" in pids
+        assert "hsl" in pids
+
+    def test_list__cached(self):
+        self.registry.list()
+        reads = len(self.reads)
+        assert reads > 0
+        self.registry.list()
+        self.registry.get("hsl")
+        assert len(self.reads) == reads
+
+    def test_list__modified(self):
+        self.write("test", "Test", 1000)
+        self.registry.list()
+        self.write("test", "Modified", 2000)
+        providers = self.registry.list()
+        names = [x["name"] for x in providers if x["pid"] == "test"]
+        assert names == ["Modified"]
+
+    def test_list__removed(self):
+        self.write("test", "Test", 1000)
+        assert "test" in [x["pid"] for x in self.registry.list()]
+        os.remove(os.path.join(self.directory, "test.json"))
+        os.utime(self.directory, (2000, 2000))
+        assert "test" not in [x["pid"] for x in self.registry.list()]
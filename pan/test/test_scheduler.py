@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pan.scheduler
+import pan.test
+import time
+
+
+class FakeProvider:
+
+    def __init__(self, stale=True, changed=True):
+        self.changed = changed
+        self.id = "fake"
+        self.stale = stale
+        self.updates = 0
+
+    def is_stale(self, network):
+        return self.stale
+
+    def update_stations(self, network, if_stale=False):
+        self.updates += 1
+        self.stale = False
+        return self.changed
+
+
+class FakeApplication:
+
+    def __init__(self, provider):
+        self.provider = provider
+
+
+class TestScheduler(pan.test.TestCase):
+
+    def setup_method(self, method):
+        self.sent = []
+        self.send = pan.scheduler.pyotherside.send
+        pan.scheduler.pyotherside.send = lambda *args: self.sent.append(args)
+
+    def teardown_method(self, method):
+        pan.scheduler.pyotherside.send = self.send
+
+    def test_run(self):
+        provider = FakeProvider()
+        scheduler = pan.Scheduler(FakeApplication(provider), interval=0.01)
+        scheduler.start()
+        for i in range(100):
+            if provider.updates: break
+            time.sleep(0.01)
+        scheduler.stop()
+        scheduler.join(1)
+        assert not scheduler.is_alive()
+        assert provider.updates == 1
+
+    def test_run__inactive(self):
+        provider = FakeProvider()
+        scheduler = pan.Scheduler(FakeApplication(provider), interval=0.01)
+        scheduler.active = False
+        scheduler.start()
+        time.sleep(0.1)
+        scheduler.stop()
+        scheduler.join(1)
+        assert provider.updates == 0
+
+    def test_stop(self):
+        scheduler = pan.Scheduler(FakeApplication(None), interval=60)
+        scheduler.start()
+        scheduler.stop()
+        scheduler.join(1)
+        assert not scheduler.is_alive()
+
+    def test_update(self):
+        provider = FakeProvider()
+        pan.Scheduler(FakeApplication(provider)).update()
+        assert provider.updates == 1
+        assert self.sent == [("stations-updated", "fake", pan.conf.network)]
+
+    def test_update__fresh(self):
+        provider = FakeProvider(stale=False)
+        pan.Scheduler(FakeApplication(provider)).update()
+        assert provider.updates == 0
+        assert not self.sent
+
+    def test_update__unchanged(self):
+        provider = FakeProvider(changed=False)
+        pan.Scheduler(FakeApplication(provider)).update()
+        assert provider.updates == 1
+        assert not self.sent
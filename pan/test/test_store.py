@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+
+# Copyright (C) 2018 Osmo Salomaa
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import pan.store
+import pan.test
+import random
+
+
+class TestStationStore(pan.test.TestCase):
+
+    def setup_method(self, method):
+        rd = random.Random(1)
+        self.stations = [dict(empty_slots=rd.randint(0, 10),
+                              free_bikes=rd.choice([None, 1, 2]),
+                              key="{:04d}".format(rd.randrange(10**4)),
+                              x=rd.uniform(24, 25),
+                              y=rd.uniform(60, 61))
+                         for i in range(1000)]
+        self.numpy = pan.store.numpy
+        self.threshold = pan.store.INCREMENTAL_THRESHOLD
+
+    def teardown_method(self, method):
+        pan.store.numpy = self.numpy
+        pan.store.INCREMENTAL_THRESHOLD = self.threshold
+
+    def brute_force(self, xmin, xmax, ymin, ymax):
+        return [x for x in self.stations
+                if xmin < x["x"] < xmax and ymin < x["y"] < ymax]
+
+    def get_stores(self):
+        # Test both the columnar and the pure-Python path.
+        stores = []
+        if self.numpy is not None:
+            stores.append(pan.StationStore(self.stations))
+        pan.store.numpy = None
+        stores.append(pan.StationStore(self.stations))
+        pan.store.numpy = self.numpy
+        return stores
+
+    def get_unique_stations(self):
+        return [dict(x, key="{:04d}".format(i))
+                for i, x in enumerate(self.stations)]
+
+    def test___len__(self):
+        for store in self.get_stores():
+            assert len(store) == 1000
+            assert len(list(store)) == 1000
+
+    def test_count(self):
+        bbox = (24.1, 24.3, 60.5, 60.6)
+        for store in self.get_stores():
+            assert store.count() == 1000
+            assert store.count(bbox) == len(self.brute_force(*bbox))
+
+    def test_count__viewport(self):
+        if self.numpy is None: return
+        store = pan.StationStore(self.stations)
+        viewport = store.list_incremental([(24.0, 24.4, 60.4, 60.7)], 10)[1]
+        for bbox in [(24.1, 24.3, 60.5, 60.6), (24.3, 24.5, 60.5, 60.6)]:
+            assert store.count(bbox, viewport) == len(self.brute_force(*bbox))
+
+    def test_count__empty(self):
+        pan.store.numpy = None
+        assert pan.StationStore([]).count((24, 25, 60, 61)) == 0
+
+    def test_get_center(self):
+        x = sum(s["x"] for s in self.stations) / 1000
+        y = sum(s["y"] for s in self.stations) / 1000
+        for store in self.get_stores():
+            center = store.get_center()
+            assert abs(center[0] - x) < 1e-9
+            assert abs(center[1] - y) < 1e-9
+            assert isinstance(center[0], float)
+
+    def test_get_center__empty(self):
+        assert pan.StationStore([]).get_center() == (None, None)
+
+    def test_list(self):
+        bbox = (24.1, 24.3, 60.5, 60.6)
+        expected = self.brute_force(*bbox)
+        expected.sort(key=lambda x: x["key"])
+        for store in self.get_stores():
+            stations = store.list([bbox], 1000)
+            assert stations == expected
+            assert store.list([bbox], 5) == expected[:5]
+
+    def test_list__bboxes(self):
+        bboxes = [(24.0, 24.6, 60.0, 60.6),
+                  (24.1, 24.5, 60.1, 60.5),
+                  (24.2, 24.4, 60.2, 60.4)]
+        expected = self.brute_force(*bboxes[1])
+        expected.sort(key=lambda x: x["key"])
+        limit = len(expected)
+        for store in self.get_stores():
+            assert store.list(bboxes, limit) == expected
+
+    def test_list__copy(self):
+        for store in self.get_stores():
+            stations = store.list([(24, 25, 60, 61)], 10)
+            assert all(type(x) is dict for x in stations)
+            assert stations[0] is not self.stations[0]
+
+    def test_list_incremental(self):
+        if self.numpy is None: return
+        pan.store.INCREMENTAL_THRESHOLD = 0
+        store = pan.StationStore(self.stations)
+        viewport = None
+        for i in range(30):
+            # Pan diagonally back and forth, zooming in and out.
+            d = 0.01 * (i % 10) - 0.002 * (i // 10)
+            w = 0.1 + 0.05 * (i % 3)
+            bboxes = [(24.3 + d, 24.3 + d + w, 60.4 - d, 60.4 - d + w),
+                      (24.32 + d, 24.28 + d + w, 60.42 - d, 60.38 - d + w)]
+            expected = store.list(bboxes, 50)
+            stations, viewport = store.list_incremental(bboxes, 50, viewport)
+            assert stations == expected
+            assert viewport.bbox == bboxes[0]
+
+    def test_list_incremental__no_numpy(self):
+        pan.store.numpy = None
+        store = pan.StationStore(self.stations)
+        bbox = (24.1, 24.3, 60.5, 60.6)
+        stations, viewport = store.list_incremental([bbox], 5)
+        assert stations == store.list([bbox], 5)
+        assert viewport is None
+
+    def test_list_incremental__other_store(self):
+        if self.numpy is None: return
+        store = pan.StationStore(self.stations)
+        bbox = (24.1, 24.3, 60.5, 60.6)
+        viewport = store.list_incremental([bbox], 5)[1]
+        stations = [dict(x, key="0") for x in self.stations]
+        store = pan.StationStore(stations)
+        stations, viewport = store.list_incremental([bbox], 5, viewport)
+        assert stations == store.list([bbox], 5)
+        assert viewport.store is store
+
+    def test_list_incremental__replaced(self):
+        if self.numpy is None: return
+        pan.store.INCREMENTAL_THRESHOLD = 0
+        self.stations = self.get_unique_stations()
+        store = pan.StationStore(self.stations)
+        bbox = (24.1, 24.3, 60.5, 60.6)
+        viewport = store.list_incremental([bbox], 5)[1]
+        stations = [dict(x, free_bikes=3) for x in self.stations]
+        store = store.replace(stations)
+        stations, viewport = store.list_incremental([bbox], 5, viewport)
+        assert stations == store.list([bbox], 5)
+        assert all(x["free_bikes"] == 3 for x in stations)
+
+    def test_replace(self):
+        bbox = (24.1, 24.3, 60.5, 60.6)
+        self.stations = self.get_unique_stations()
+        stations = [dict(x, free_bikes=3) for x in reversed(self.stations)]
+        for store in self.get_stores():
+            clusters = store.get_clusters()
+            replaced = store.replace(stations)
+            assert len(replaced) == len(store)
+            assert replaced._grid._offsets is store._grid._offsets
+            assert replaced._x is store._x
+            expected = store.list([bbox], 100)
+            found = replaced.list([bbox], 100)
+            assert [x["key"] for x in found] == [x["key"] for x in expected]
+            assert all(x["free_bikes"] == 3 for x in found)
+            found = replaced.list_clusters(bbox, 0)
+            assert sum(x["free_bikes"] for x in found) == 3 * sum(
+                x["count"] for x in found)
+            # The original store is left as it was.
+            assert store.get_clusters() is clusters
+            assert store.list([bbox], 100) == expected
+
+    def test_replace__different(self):
+        self.stations = self.get_unique_stations()
+        for store in self.get_stores():
+            self.assert_raises(ValueError, store.replace, self.stations[1:])
@@ -15,16 +15,50 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import json
 import os
 import pan.test
+import pan.util
+import random
 import tempfile
 
 
 class TestModule(pan.test.TestCase):
 
+    def setup_method(self, method):
+        self.numpy = pan.util.numpy
+        rd = random.Random(1)
+        self.items = [dict(x=rd.uniform(-180, 180), y=rd.uniform(-80, 80))
+                      for i in range(100)]
+
+    def teardown_method(self, method):
+        pan.util.numpy = self.numpy
+
+    def get_numpies(self):
+        # Test both the vectorized and the pure-Python path.
+        if self.numpy is None: return [None]
+        return [self.numpy, None]
+
+    def test_api_query(self):
+        class Provider:
+            id = "test"
+            @pan.util.api_query([])
+            def list_stations(self, fail):
+                if fail: 1/0
+                return [1]
+        pan.metrics.registry.reset()
+        assert Provider().list_stations(False) == [1]
+        assert Provider().list_stations(True) == []
+        stats = pan.metrics.registry.get_stats()
+        for stats in [stats["api"], stats["provider"]["test"]]:
+            assert stats["list_stations"]["calls"] == 2
+            assert stats["list_stations"]["errors"] == 1
+            assert stats["list_stations"]["latency"]["count"] == 2
+
     def test_atomic_open__file_exists(self):
         text = "testing\ntesting\n"
         handle, path = tempfile.mkstemp()
+        os.close(handle)
         with pan.util.atomic_open(path, "w") as f:
             f.write(text)
         assert open(path, "r").read() == text
@@ -33,6 +67,7 @@ class TestModule(pan.test.TestCase):
     def test_atomic_open__new_file(self):
         text = "testing\ntesting\n"
         handle, path = tempfile.mkstemp()
+        os.close(handle)
         os.remove(path)
         with pan.util.atomic_open(path, "w") as f:
             f.write(text)
@@ -43,3 +78,50 @@ class TestModule(pan.test.TestCase):
         # From Helsinki to Lissabon.
         dist = pan.util.calculate_distance(24.94, 60.17, -9.14, 38.72)
         assert round(dist/1000) == 3361
+
+    def test_calculate_distances(self):
+        for numpy in self.get_numpies():
+            pan.util.numpy = numpy
+            dist = pan.util.calculate_distances(self.items, 24.94, 60.17)
+            for item, d in zip(self.items, dist):
+                expected = pan.util.calculate_distance(item["x"], item["y"], 24.94, 60.17)
+                assert abs(d - expected) < 0.01
+
+    def test_read_json__text(self):
+        # Simulate the standard library json before Python 3.6.
+        backend = pan.jsonlib.backend
+        pan.jsonlib.set_backend("json")
+        pan.jsonlib.accepts_bytes = False
+        def loads(data):
+            if isinstance(data, bytes): raise TypeError
+            return json.loads(data)
+        pan.jsonlib._loads = loads
+        handle, path = tempfile.mkstemp()
+        os.close(handle)
+        try:
+            pan.util.write_json(dict(name="Töölöntori"), path)
+            assert pan.util.read_json(path) == dict(name="Töölöntori")
+        finally:
+            os.remove(path)
+            pan.jsonlib.set_backend(backend)
+
+    def test_sorted_by_distance(self):
+        dist = lambda z: pan.util.calculate_distance(z["x"], z["y"], 24.94, 60.17)
+        expected = sorted(self.items, key=dist)
+        for numpy in self.get_numpies():
+            pan.util.numpy = numpy
+            items = pan.util.sorted_by_distance(self.items, 24.94, 60.17)
+            assert items == expected
+            assert all(set(x) == {"x", "y"} for x in self.items)
+
+    def test_sorted_by_distance__limit(self):
+        dist = lambda z: pan.util.calculate_distance(z["x"], z["y"], 24.94, 60.17)
+        expected = sorted(self.items, key=dist)
+        for numpy in self.get_numpies():
+            pan.util.numpy = numpy
+            sort = pan.util.sorted_by_distance
+            assert sort(self.items, 24.94, 60.17, 10) == expected[:10]
+            assert sort(self.items, 24.94, 60.17, 10, 10) == expected[10:20]
+            assert sort(self.items, 24.94, 60.17, 10, 95) == expected[95:]
+            assert sort(self.items, 24.94, 60.17, 10, 100) == []
+            assert sort([], 24.94, 60.17, 10) == []
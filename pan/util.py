@@ -20,7 +20,7 @@
 import contextlib
 import copy
 import functools
-import glob
+import heapq
 import json
 import math
 import os
@@ -30,29 +30,49 @@ import shutil
 import socket
 import stat
 import sys
+import time
 import traceback
 import urllib
 
 from pan.i18n import _
 
+# NumPy is optional, used for vectorized
+# calculations if available, imported on first use.
+numpy = pan.imports.lazy_import("numpy")
+
 
 def api_query(fallback):
     """Decorator for API requests with graceful error handling."""
     def outer_wrapper(function):
         @functools.wraps(function)
         def inner_wrapper(*args, **kwargs):
+            # Record calls, errors and latency both per API
+            # and per provider, the first argument if a method.
+            names = ["api.{}".format(function.__name__)]
+            if args and hasattr(args[0], "id"):
+                names.append("provider.{}.{}".format(args[0].id, function.__name__))
+            start = time.perf_counter()
+            error = True
             try:
                 # function can fail due to connection errors or errors
                 # in parsing the received data. Notify the user of some
                 # common errors by returning a dictionary with the error
                 # message to be displayed. With unexpected errors, print
                 # a traceback and return blank of correct type.
-                return function(*args, **kwargs)
+                value = function(*args, **kwargs)
+                error = False
+                return value
             except socket.timeout:
                 return dict(error=True, message=_("Connection timed out"))
             except Exception:
                 traceback.print_exc()
                 return copy.deepcopy(fallback)
+            finally:
+                elapsed = time.perf_counter() - start
+                for name in names:
+                    pan.metrics.registry.count(name + ".calls")
+                    pan.metrics.registry.count(name + ".errors", int(error))
+                    pan.metrics.registry.observe(name + ".latency", elapsed)
         return inner_wrapper
     return outer_wrapper
 
@@ -98,19 +118,29 @@ def calculate_distance(x1, y1, x2, y2):
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
     return 6371000 * c
 
+def calculate_distances(items, x, y):
+    """
+    Calculate distances in meters from `items` to given coordinates.
+
+    Return a NumPy array if NumPy is available, otherwise a list.
+    """
+    if numpy is None:
+        return [calculate_distance(item["x"], item["y"], x, y) for item in items]
+    x1 = numpy.fromiter((item["x"] for item in items), float, len(items))
+    y1 = numpy.fromiter((item["y"] for item in items), float, len(items))
+    x1, y1 = numpy.radians(x1), numpy.radians(y1)
+    x2, y2 = math.radians(x), math.radians(y)
+    a = (numpy.sin((y2 - y1)/2)**2 +
+         numpy.sin((x2 - x1)/2)**2 * numpy.cos(y1) * math.cos(y2))
+    c = 2 * numpy.arctan2(numpy.sqrt(a), numpy.sqrt(1 - a))
+    return 6371000 * c
+
 def get_providers():
     """Return a list of dictionaries of provider attributes."""
-    providers = []
-    for parent in (pan.DATA_HOME_DIR, pan.DATA_DIR):
-        for path in glob.glob("{}/providers/*.json".format(parent)):
-            pid = os.path.basename(path).replace(".json", "")
-            # Local definitions override global ones.
-            if pid in (x["pid"] for x in providers): continue
-            provider = read_json(path)
-            provider["pid"] = pid
-            provider["active"] = (pid == pan.conf.provider)
-            providers.append(provider)
-    providers.sort(key=lambda x: x["name"])
+    # Attributes are cached, see pan.registry.
+    providers = pan.registry.providers.list()
+    for provider in providers:
+        provider["active"] = (provider["pid"] == pan.conf.provider)
     return providers
 
 def locked_method(function):
@@ -145,9 +175,13 @@ def path2uri(path):
 
 def read_json(path):
     """Read data from JSON file at `path`."""
+    # Read bytes if the JSON backend accepts them,
+    # avoiding an intermediate decoded copy of the text.
+    mode, encoding = (("rb", None) if pan.jsonlib.accepts_bytes
+                      else ("r", "utf_8"))
     try:
-        with open(path, "r", encoding="utf_8") as f:
-            data = json.load(f)
+        with open(path, mode, encoding=encoding) as f:
+            data = pan.jsonlib.loads(f.read())
     except Exception as error:
         print("Failed to read file {}: {}"
               .format(repr(path), str(error)),
@@ -173,14 +207,30 @@ def silent(*exceptions, tb=False):
     except exceptions:
         if tb: traceback.print_exc()
 
-def sorted_by_distance(items, x, y):
-    """Return `items` sorted by distance from given coordinates."""
-    for item in items:
-        item["__dist"] = calculate_distance(item["x"], item["y"], x, y)
-    items = sorted(items, key=lambda z: z["__dist"])
-    for item in items:
-        del item["__dist"]
-    return items
+def sorted_by_distance(items, x, y, limit=None, offset=0):
+    """
+    Return `items` sorted by distance from given coordinates.
+
+    If `limit` is not ``None``, return at most `limit` items starting at
+    `offset`, using partial selection instead of sorting all of `items`.
+    `items` themselves are not modified.
+    """
+    n = len(items)
+    end = n if limit is None else min(n, offset + limit)
+    if offset >= end: return []
+    dist = calculate_distances(items, x, y)
+    if numpy is not None:
+        if end < n:
+            indices = numpy.argpartition(dist, end - 1)[:end]
+            indices = indices[numpy.argsort(dist[indices], kind="stable")]
+        else:
+            indices = numpy.argsort(dist, kind="stable")
+    else:
+        if end < n:
+            indices = heapq.nsmallest(end, range(n), key=dist.__getitem__)
+        else:
+            indices = sorted(range(n), key=dist.__getitem__)
+    return [items[i] for i in indices[offset:end]]
 
 def write_json(data, path):
     """Write `data` to JSON file at `path`."""
@@ -28,7 +28,7 @@ def list_networks():
     """Return a list of supported city bike networks."""
     url = "https://api.citybik.es/v2/networks?fields=id,location,name"
     networks = pan.http.get_json(url)
-    networks = pan.AttrDict(networks)
+    networks = pan.LazyAttrDict(networks)
     return [dict(
         city=network.location.city,
         country=network.location.country,
@@ -42,7 +42,7 @@ def list_stations(network):
     """Return a list of bike stations and their occupancy."""
     url = "https://api.citybik.es/v2/networks/{}?fields=stations".format(network)
     stations = pan.http.get_json(url)
-    stations = pan.AttrDict(stations)
+    stations = pan.LazyAttrDict(stations)
     return [dict(
         empty_slots=station.empty_slots,
         free_bikes=station.free_bikes,
@@ -123,7 +123,7 @@ CoverBackground {
             view.model.set(i, {"bikes": -1, "capacity": -1, "name": ""});
     }
 
-    function update(bbox) {
+    function update() {
         // Update the list of closest bike stations.
         var stations = map.stations.sort(function(a, b) {
             return (map.center.distanceTo(a.coordinate) -
@@ -30,12 +30,15 @@ Map {
     minimumZoomLevel: 3
     plugin: MapPlugin {}
 
+    property bool active: app.running && (page.status === PageStatus.Active || cover.active) && map.ready
     property bool centerFound: false
     property bool changed: true
+    property var  clusters: []
     property bool ready: false
     property var  stations: []
+    property var  stationsByUid: ({})
     property var  updating: false
-    property var  utime: -1
+    property string version: ""
     property real zoomLevelPrev: 8
 
     Behavior on center {
@@ -59,10 +62,12 @@ Map {
     StatusMessage { id: statusMessage }
 
     Timer {
+        // Stations are updated in the background by the Python side,
+        // which notifies us of changes; only poll after viewport moves.
         interval: 500
         repeat: true
-        running: app.running && (page.status === PageStatus.Active || cover.active) && map.ready
-        onTriggered: (map.changed || Date.now() - map.utime > 60000) && map.updateStations();
+        running: map.active
+        onTriggered: map.changed && map.updateStations();
     }
 
     MouseArea {
@@ -86,9 +91,19 @@ Map {
         // XXX: Must set zoomLevel in onCompleted.
         // https://bugreports.qt.io/browse/QTBUG-40779
         map.setZoomLevel(Theme.pixelRatio >= 1.5 ? 15 : 14);
+        // Stations are updated in the background, update
+        // station markers once changed data is available.
+        py.setHandler("stations-updated", function(provider, network) {
+            map.changed = true;
+        });
         map.ready = true;
     }
 
+    onActiveChanged: {
+        // Avoid background updates when stations are not visible.
+        py.ready && py.call("pan.app.set_active", [map.active], null);
+    }
+
     onCenterChanged: {
         // Ensure that stations are updated after panning.
         // This gets fired ridiculously often, so keep simple.
@@ -108,18 +123,57 @@ Map {
         }
     }
 
+    function addCluster(props) {
+        // Add a new cluster marker to the map.
+        var component = Qt.createComponent("Station.qml");
+        var cluster = component.createObject(map);
+        map.setCluster(cluster, props);
+        map.clusters.push(cluster);
+        map.addMapItem(cluster);
+    }
+
     function addStation(props) {
         // Add a new station marker to the map.
         var component = Qt.createComponent("Station.qml");
         var station = component.createObject(map);
-        station.uid = props.id;
-        station.name = props.name;
-        station.coordinate = QtPositioning.coordinate(props.y, props.x);
-        station.setCounts(props.free_bikes, props.empty_slots);
+        map.setStation(station, props);
         map.stations.push(station);
         map.addMapItem(station);
     }
 
+    function applyChanges(changes) {
+        // Update station markers to match changes since previous version.
+        var free = [];
+        if (changes.reset) {
+            free = map.stations.slice();
+            map.stationsByUid = {};
+        }
+        for (var i = 0; i < changes.removed.length; i++) {
+            var station = map.stationsByUid[changes.removed[i]];
+            if (!station) continue;
+            delete map.stationsByUid[changes.removed[i]];
+            free.push(station);
+        }
+        var added = changes.added.slice();
+        for (var i = 0; i < changes.changed.length; i++) {
+            var station = map.stationsByUid[changes.changed[i].id];
+            station ? map.setStation(station, changes.changed[i]) :
+                added.push(changes.changed[i]);
+        }
+        // Reuse free markers before creating new ones.
+        for (var i = 0; i < added.length; i++) {
+            free.length > 0 ?
+                map.setStation(free.pop(), added[i]) :
+                map.addStation(added[i]);
+        }
+        for (var i = 0; i < free.length; i++) {
+            map.stations.splice(map.stations.indexOf(free[i]), 1);
+            map.removeMapItem(free[i]);
+            free[i].destroy();
+        }
+        map.version = changes.version;
+    }
+
     function centerOnPosition() {
         // Center map on current position.
         var coord = gps.position.coordinate;
@@ -129,12 +183,15 @@ Map {
     }
 
     function clearStations() {
-        // Remove all station markers from the map.
+        // Remove all station and cluster markers from the map.
+        map.setClusters([]);
         while (map.stations.length > 0) {
             var station = map.stations.pop();
             map.removeMapItem(station);
             station.destroy();
         }
+        map.stationsByUid = {};
+        map.version = "";
     }
 
     function getBoundingBox() {
@@ -150,6 +207,38 @@ Map {
         map.center = QtPositioning.coordinate(y, x);
     }
 
+    function setCluster(cluster, props) {
+        // Update cluster marker to match props.
+        cluster.count = props.count;
+        cluster.uid = props.id;
+        cluster.name = "";
+        cluster.coordinate = QtPositioning.coordinate(props.y, props.x);
+        cluster.setCounts(props.free_bikes, props.empty_slots);
+    }
+
+    function setClusters(clusters) {
+        // Update cluster markers to match clusters, reusing existing markers.
+        for (var i = 0; i < clusters.length; i++) {
+            i < map.clusters.length ?
+                map.setCluster(map.clusters[i], clusters[i]) :
+                map.addCluster(clusters[i]);
+        }
+        while (map.clusters.length > clusters.length) {
+            var cluster = map.clusters.pop();
+            map.removeMapItem(cluster);
+            cluster.destroy();
+        }
+    }
+
+    function setStation(station, props) {
+        // Update station marker to match props.
+        station.uid = props.id;
+        station.name = props.name;
+        station.coordinate = QtPositioning.coordinate(props.y, props.x);
+        station.setCounts(props.free_bikes, props.empty_slots);
+        map.stationsByUid[props.id] = station;
+    }
+
     function setZoomLevel(zoom) {
         // Set the current zoom level.
         zoomAnimation.enabled = true;
@@ -158,70 +247,36 @@ Map {
         zoomAnimation.enabled = false;
     }
 
-    function updateStationMatching(props) {
-        // Update matching station marker if found.
-        for (var i = 0; i < map.stations.length; i++) {
-            if (map.stations[i].uid !== props.id) continue;
-            var coord = QtPositioning.coordinate(props.y, props.x);
-            map.stations[i].name = props.name;
-            map.stations[i].coordinate = coord;
-            map.stations[i].setCounts(props.free_bikes, props.empty_slots);
-            props.found = true;
-            map.stations[i].found = true;
-            return;
-        }
-    }
-
-    function updateStationReuse(props) {
-        // Update station reusing any existing free marker.
-        for (var i = 0; i < map.stations.length; i++) {
-            if (map.stations[i].found) continue;
-            var coord = QtPositioning.coordinate(props.y, props.x);
-            map.stations[i].uid = props.id;
-            map.stations[i].name = props.name;
-            map.stations[i].coordinate = coord;
-            map.stations[i].setCounts(props.free_bikes, props.empty_slots);
-            props.found = true;
-            map.stations[i].found = true;
-            return;
-        }
-    }
-
     function updateStations() {
         // Fetch data from the Python backend and update station markers.
         if (!py.ready) return;
         if (map.updating) return;
         map.updating = true;
         var bbox = map.getBoundingBox();
-        py.call("pan.app.list_stations", [bbox], function(results) {
-            var left = function(x) { return !x.found; };
-            for (var i = 0; i < map.stations.length; i++)
-                map.stations[i].found = false;
-            for (var i = 0; i < results.length; i++)
-                map.updateStationMatching(results[i]);
-            results = results.filter(left);
-            for (var i = 0; i < results.length; i++)
-                map.updateStationReuse(results[i]);
-            results = results.filter(left);
-            for (var i = 0; i < results.length; i++)
-                map.addStation(results[i]);
+        // If no positioning data has yet been received, we can
+        // fall back to centering on the network.
+        // Zoomed out views with too many stations to show individually
+        // get clusters covering all of them instead of stations.
+        var fields = ["clusters", "stations", "total"];
+        map.centerFound || fields.push("center");
+        // Request only changes since the stations we already have.
+        var args = [bbox, fields, map.version, Math.floor(map.zoomLevel)];
+        py.call("pan.app.query_viewport", args, function(result) {
+            if (result.stations && result.stations.version)
+                map.applyChanges(result.stations);
+            map.setClusters(result.clusters || []);
             // Inform user if not all stations are visible.
-            statusMessage.update(bbox);
-            cover.update(bbox);
+            var clustered = result.clusters && result.clusters.length > 0;
+            statusMessage.update(clustered ? 0 : result.total || 0);
+            cover.update();
             map.updating = false;
-            if (!map.centerFound) {
-                // If no positioning data has yet been received, we can
-                // fall back to centering on the network, which is possible
-                // after a list_stations call has been made.
-                py.call("pan.app.get_center", [], function(coord) {
-                    if (!coord.x || !coord.y) return;
-                    map.setCenter(coord.x, coord.y);
-                    map.centerFound = true;
-                });
+            if (!map.centerFound && result.center &&
+                result.center.x && result.center.y) {
+                map.setCenter(result.center.x, result.center.y);
+                map.centerFound = true;
             }
         });
         map.changed = false;
-        map.utime = Date.now();
     }
 
 }
@@ -24,8 +24,9 @@ Page {
     id: page
     allowedOrientations: app.defaultAllowedOrientations
 
-    property bool loading: false
-    property var  networks: []
+    property bool   loading: false
+    property var    networks: []
+    property string partial: ""
 
     SilicaListView {
         id: view
@@ -86,6 +87,7 @@ Page {
 
             PageHeader {
                 id: header
+                description: page.partial
                 title: app.tr("Networks")
             }
 
@@ -114,10 +116,18 @@ Page {
         running: page.loading
     }
 
+    Component.onCompleted: {
+        // Providers that time out are skipped, name those in the header.
+        py.setHandler("list-networks-partial", function(names) {
+            page.partial = app.tr("Timed out: %1", names.join(", "));
+        });
+    }
+
     onStatusChanged: {
         if (page.status === PageStatus.Activating) {
             view.model.clear();
             page.loading = true;
+            page.partial = "";
             busy.text = app.tr("Loading");
         } else if (page.status === PageStatus.Active) {
             page.loadNetworks();
@@ -148,11 +158,12 @@ Page {
     }
 
     function loadNetworks() {
-        // Load provider model entries from the Python backend.
+        // Load provider model entries from the Python backend,
+        // first the closest networks to show and then the rest.
         view.model.clear();
         var x = map.center.longitude || 0;
         var y = map.center.latitude || 0;
-        py.call("pan.app.list_networks", [x, y], function(results) {
+        py.call("pan.app.list_networks", [x, y, 20, 0], function(results) {
             if (results && results.error && results.message) {
                 busy.error = results.message;
                 page.loading = false;
@@ -160,6 +171,7 @@ Page {
                 page.networks = results;
                 page.loading = false;
                 page.filterNetworks();
+                page.loadNetworksRest(x, y, results.length);
             } else {
                 busy.error = app.tr("No networks found");
                 page.loading = false;
@@ -167,4 +179,18 @@ Page {
         });
     }
 
+    function loadNetworksRest(x, y, offset) {
+        // Load the rest of provider model entries from the Python backend.
+        py.call("pan.app.list_networks", [x, y, null, offset], function(results) {
+            if (!results || !results.length) return;
+            page.networks = page.networks.concat(results);
+            if (view.searchField.text !== "")
+                return page.filterNetworks();
+            for (var i = 0; i < results.length; i++) {
+                results[i].city_qml = results[i].city;
+                view.model.append(results[i]);
+            }
+        });
+    }
+
 }
@@ -78,7 +78,7 @@ MapQuickItem {
 
     property int    bikes: 0
     property int    capacity: 0
-    property bool   found: false
+    property int    count: 1
     property string label: ""
     property string name: ""
     property string uid: ""
@@ -100,6 +100,9 @@ MapQuickItem {
         } else {
             station.capacity = -1;
         }
+        // Clusters of several stations show sums prefixed with the amount of stations.
+        if (station.count > 1)
+            station.label = "%1 × %2".arg(station.count).arg(station.label);
     }
 
 }